@@ -0,0 +1,4 @@
+"""Benchmarks of ledgertools on synthetic data; run from the top of the repo, eg:
+
+    python -m benchmarks.stgeorge_parse
+"""
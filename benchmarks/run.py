@@ -0,0 +1,174 @@
+"""Time, and measure the peak memory of, the main stages on synthetic data of each size.
+
+    python -m benchmarks.run --sizes 10000,100000,1000000 --output bench_results.json
+    python -m benchmarks.run --sizes 10000 --baseline bench_results.json
+
+The results are written as json, to compare a later run against with --baseline.
+"""
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+from ledgertools.accounts import AccountFile, find_unknown_merchants
+from ledgertools.stgeorge import StGeorgeFile, to_beancount
+
+from .synthetic import MERCHANTS, write_accounts_yaml, write_stgeorge_csv, write_up_json
+
+BANK_ACCOUNT = 'Assets:Bank:CompleteFreedom'
+
+# patterns in the accounts yaml which match nothing, as a real one has many
+EXTRA_PATTERNS = 500
+
+# bump this when the results file changes shape
+RESULTS_VERSION = 1
+
+
+class Inputs:
+    """The synthetic files of one size."""
+
+    def __init__(self, directory, rows):
+        self.rows = rows
+        self.csv_file = os.path.join(directory, f'stgeorge-{rows}.csv')
+        self.up_file = os.path.join(directory, f'up-{rows}.json')
+        self.yaml_file = os.path.join(directory, 'accounts.yaml')
+        write_stgeorge_csv(self.csv_file, rows)
+        write_up_json(self.up_file, rows)
+        # the last merchants stay unknown, for the report
+        write_accounts_yaml(self.yaml_file, MERCHANTS[:4], extra=EXTRA_PATTERNS)
+        with StGeorgeFile(self.csv_file) as thefile:
+            self.descriptions = [row[1] for row in thefile]
+
+
+def accounts_match(inputs):
+    accounts = AccountFile(inputs.yaml_file, cache_dir=None)
+    for description in inputs.descriptions:
+        accounts.match(description)
+
+
+def stgeorge_iter(inputs):
+    with StGeorgeFile(inputs.csv_file) as thefile:
+        for _ in thefile:
+            pass
+
+
+def stgeorge_to_beancount(inputs):
+    for _ in to_beancount(inputs.csv_file, inputs.yaml_file, BANK_ACCOUNT):
+        pass
+
+
+def upbank_extract(inputs):
+    # beancount is only needed here
+    from beancount.ingest import cache
+    from ledgertools.upbank_ingest import UpbankImporter
+
+    importer = UpbankImporter(accounts=AccountFile(inputs.yaml_file, cache_dir=None))
+    importer.extract(cache.get_file(inputs.up_file))
+
+
+def unknown_merchants(inputs):
+    # reads an Up download and a St George export; rows is of each
+    find_unknown_merchants([inputs.up_file, inputs.csv_file], inputs.yaml_file, top=20, out=io.StringIO())
+
+
+BENCHMARKS = dict(
+    accounts_match=accounts_match,
+    stgeorge_iter=stgeorge_iter,
+    to_beancount=stgeorge_to_beancount,
+    upbank_extract=upbank_extract,
+    find_unknown_merchants=unknown_merchants,
+)
+
+
+def measure(benchmark, inputs, memory=True):
+    """Return the seconds a benchmark takes, then its peak memory in a second, traced, run."""
+    start = time.perf_counter()
+    benchmark(inputs)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            benchmark(inputs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return dict(
+        seconds=round(seconds, 4),
+        rows_per_second=round(inputs.rows / seconds),
+        peak_bytes=peak,
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_baseline(filename):
+    """Return (benchmark, rows) -> rows per second of an earlier run."""
+    with open(filename) as fh:
+        results = json.load(fh)
+    if results.get('version') != RESULTS_VERSION:
+        raise click.UsageError(f"{filename} isn't a results file of this version")
+    return {(result['benchmark'], result['rows']): result['rows_per_second'] for result in results['results']}
+
+
+def parse_sizes(ctx, param, value):
+    try:
+        return [int(size.replace('_', '')) for size in value.split(',')]
+    except ValueError:
+        raise click.BadParameter("a comma separated list of row counts, eg: 10000,100000")
+
+
+@click.command()
+@click.option('--sizes', default='10000,100000,1000000', show_default=True, callback=parse_sizes,
+              help="rows of synthetic data to run each benchmark on")
+@click.option('--only', multiple=True, type=click.Choice(list(BENCHMARKS)), help="run just these benchmarks")
+@click.option('-o', '--output', default='bench_results.json', show_default=True, type=click.Path(dir_okay=False),
+              help="where to write the results")
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help="an earlier results file, to compare the speed against")
+@click.option('--memory/--no-memory', default=True, show_default=True,
+              help="trace the peak memory of each benchmark; a second run, several times slower")
+def main(sizes, only, output, baseline, memory):
+    baseline = read_baseline(baseline) if baseline else {}
+    names = only or list(BENCHMARKS)
+    results = []
+    with tempfile.TemporaryDirectory() as tempdir:
+        for rows in sizes:
+            inputs = Inputs(tempdir, rows)
+            for name in names:
+                result = dict(benchmark=name, rows=rows, **measure(BENCHMARKS[name], inputs, memory))
+                results.append(result)
+                line = f"{name:>22} {rows:>9,}: {result['seconds']:>8.3f}s {result['rows_per_second']:>10,} rows/s"
+                if memory:
+                    line += f" {result['peak_bytes'] / 2**20:>8.1f}MB peak"
+                if (name, rows) in baseline:
+                    line += f"  {result['rows_per_second'] / baseline[name, rows]:.2f}x baseline"
+                click.echo(line)
+
+    with open(output, 'w') as fh:
+        json.dump(dict(
+            version=RESULTS_VERSION,
+            created=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            revision=git_revision(),
+            python=platform.python_version(),
+            machine=platform.machine(),
+            results=results,
+        ), fh, indent=2)
+        fh.write('\n')
+    click.echo(f"results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Time write_beancount against writing each record of to_beancount, on a synthetic export.
+
+    python -m benchmarks.stgeorge_beancount --rows 1000000
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+import click
+
+from ledgertools.stgeorge import to_beancount, write_beancount
+
+from .synthetic import write_accounts_yaml, write_stgeorge_csv
+
+BANK_ACCOUNT = 'Assets:Bank:CompleteFreedom'
+
+
+def checksum(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fh:
+        while block := fh.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def generator(csv_file, yaml_file, out):
+    with open(out, 'w') as fh:
+        for record in to_beancount(csv_file, yaml_file, BANK_ACCOUNT):
+            fh.write(record)
+
+
+def bulk(csv_file, yaml_file, out):
+    write_beancount(csv_file, yaml_file, BANK_ACCOUNT, out)
+
+
+@click.command()
+@click.option('--rows', 'count', default=1_000_000, show_default=True, help="rows in the synthetic export")
+def main(count):
+    with tempfile.TemporaryDirectory() as tempdir:
+        csv_file = os.path.join(tempdir, 'stgeorge.csv')
+        yaml_file = os.path.join(tempdir, 'accounts.yaml')
+        write_stgeorge_csv(csv_file, count)
+        write_accounts_yaml(yaml_file)
+
+        checksums = set()
+        for name, convert in [('generator', generator), ('bulk', bulk)]:
+            out = os.path.join(tempdir, f'{name}.beancount')
+            start = time.perf_counter()
+            convert(csv_file, yaml_file, out)
+            seconds = time.perf_counter() - start
+            checksums.add(checksum(out))
+            click.echo(f"{name:>9}: {seconds:.3f}s  {count / seconds:,.0f} rows/s")
+        if len(checksums) != 1:
+            raise click.ClickException("the outputs differ")
+        click.echo("outputs identical")
+
+
+if __name__ == '__main__':
+    main()
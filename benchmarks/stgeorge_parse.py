@@ -0,0 +1,64 @@
+"""Time StGeorgeFile._parsed against the parser it replaced, on a synthetic export.
+
+    python -m benchmarks.stgeorge_parse --rows 1000000
+"""
+import csv
+import os
+import re
+import tempfile
+import time
+
+import click
+
+from ledgertools.stgeorge import StGeorgeFile
+
+from .synthetic import write_stgeorge_csv
+
+
+def legacy_parsed(row, types=list(StGeorgeFile.DESCRIPTION_TYPES), time_regex=StGeorgeFile.TIME_REGEX.pattern):
+    """StGeorgeFile._parsed as it was; a list lookup, and the regex looked up per row."""
+    date, description, credit, debit, balance, *categories = row
+    transaction_type = description[:30]
+    if transaction_type.strip() not in types:
+        return row + [''] * 4
+    effective_date = description[30:35]
+    if not re.match(time_regex, description[35:]):
+        effective_time = ''
+        merchant = description[36:56].strip()
+        location = description[57:]
+    else:
+        effective_time = description[35:40]
+        merchant = " ".join(description[41:].split())
+        location = ''
+    return [date, merchant, credit, debit, balance, transaction_type.strip(), effective_date, effective_time, location]
+
+
+def timed(parse, rows):
+    start = time.perf_counter()
+    for row in rows:
+        parse(row)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.option('--rows', 'count', default=1_000_000, show_default=True, help="rows in the synthetic export")
+@click.option('--repeat', default=3, show_default=True, help="take the best of this many runs")
+def main(count, repeat):
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, 'stgeorge.csv')
+        write_stgeorge_csv(filename, count)
+        with StGeorgeFile(filename) as thefile:
+            rows = [row for row in csv.reader(thefile.fileobj, thefile.dialect) if row]
+            for name, parse in [('legacy', legacy_parsed), ('_parsed', thefile._parsed)]:
+                seconds = min(timed(parse, rows) for _ in range(repeat))
+                click.echo(f"{name:>8}: {seconds:.3f}s  {count / seconds:,.0f} rows/s")
+
+            start = time.perf_counter()
+            for _ in thefile:
+                pass
+            seconds = time.perf_counter() - start
+            click.echo(f"{'file':>8}: {seconds:.3f}s  {count / seconds:,.0f} rows/s, read backwards and parsed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Generators of synthetic bank exports, for benchmarking."""
+import datetime
+import json
+import random
+
+# The St George descriptions, by kind; `{}` are filled in per row.
+STGEORGE_DESCRIPTIONS = [
+    "Visa Purchase                 {day}{month} {merchant:<20} {location}",
+    "Eftpos Purchase               {day}{month}{time} {merchant}  {location}",
+    "Osko Withdrawal               {day}{month}{time} {merchant}",
+    "Credit Interest",
+    "Increase 50 Per Month",
+]
+
+MERCHANTS = ["Coles 0543", "Woolworths 1234", "Aldi 104", "Bunnings 2019", "Caltex Manly", "Bobs Bar"]
+LOCATIONS = ["Manly Au", "Brookvale Au", "Sydney Au"]
+
+# Up's (parent, child) categories; None for an uncategorised transaction
+UP_CATEGORIES = [("good-life", "restaurants-and-cafes"), ("home", "groceries"), ("transport", "fuel"), None]
+
+# transactions in each page of the Up API
+UP_PAGE_SIZE = 100
+
+
+def stgeorge_rows(count, seed=0):
+    """Yield count csv lines of a St George export, newest first, as the bank writes them."""
+    rng = random.Random(seed)
+    day = datetime.date(2021, 1, 1) + datetime.timedelta(days=count // 20)
+    balance = 1000.0 * count
+    for i in range(count):
+        if i % 20 == 0:
+            day -= datetime.timedelta(days=1)
+        amount = rng.randrange(100, 20000) / 100
+        description = rng.choice(STGEORGE_DESCRIPTIONS).format(
+            day=day.strftime('%d'),
+            month=day.strftime('%b'),
+            time=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+            merchant=rng.choice(MERCHANTS),
+            location=rng.choice(LOCATIONS),
+        )
+        balance += amount
+        yield f"{day.strftime('%d/%m/%Y')},{description},{amount:.2f},,{balance:.2f}\n"
+
+
+def write_stgeorge_csv(filename, count, seed=0):
+    """Write a St George export of count rows, with a header."""
+    with open(filename, 'w') as fh:
+        fh.write("Date,Description,Debit,Credit,Balance\n")
+        fh.writelines(stgeorge_rows(count, seed))
+
+
+def up_transaction(i, created, rng):
+    """Return a transaction as the Up API lists it."""
+    merchant = rng.choice(MERCHANTS)
+    category = rng.choice(UP_CATEGORIES)
+    amount = f"-{rng.randrange(100, 20000) / 100:.2f}"
+    return {
+        "type": "transactions",
+        "id": f"{i:08d}-0000-4000-8000-000000000000",
+        "attributes": {
+            "status": "SETTLED",
+            "rawText": f"{merchant.upper()}, {rng.choice(LOCATIONS).upper()}",
+            "description": merchant,
+            "message": None,
+            "amount": {"currencyCode": "AUD", "value": amount, "valueInBaseUnits": int(amount.replace('.', ''))},
+            "settledAt": created.isoformat(),
+            "createdAt": created.isoformat(),
+        },
+        "relationships": {
+            "category": {"data": category and {"type": "categories", "id": category[1]}},
+            "parentCategory": {"data": category and {"type": "categories", "id": category[0]}},
+        },
+    }
+
+
+def up_pages(count, seed=0, page_size=UP_PAGE_SIZE):
+    """Yield the pages of the Up API listing count transactions, newest first, as Up does."""
+    rng = random.Random(seed)
+    newest = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=10)))
+    for first in range(0, count, page_size):
+        data = [
+            up_transaction(count - i, newest - datetime.timedelta(minutes=20 * i), rng)
+            for i in range(first, min(first + page_size, count))
+        ]
+        following = first + page_size < count
+        yield {
+            "data": data,
+            "links": {
+                "prev": None,
+                "next": f"https://api.up.com.au/api/v1/transactions?page[after]={first + page_size}" if following else None,
+            },
+        }
+
+
+def write_up_json(filename, count, seed=0):
+    """Write a download of count Up transactions; the pages' data in one json array, as `upbank month` does."""
+    with open(filename, 'w') as fh:
+        fh.write("[\n")
+        separator = ""
+        for page in up_pages(count, seed):
+            for transaction in page["data"]:
+                fh.write(separator)
+                fh.write(json.dumps(transaction))
+                separator = ",\n"
+        fh.write("\n]\n")
+
+
+def write_accounts_yaml(filename, merchants=MERCHANTS, extra=0, fanout=10):
+    """Write an accounts yaml which knows the merchants, and extra patterns which match nothing.
+
+    The extra patterns are spread over accounts nested ever deeper, fanout to a level.
+    """
+    with open(filename, 'w') as fh:
+        fh.write("Expenses:\n  Shopping:\n")
+        for merchant in merchants:
+            fh.write(f"    - {merchant}\n")
+        if extra:
+            fh.write("  Other:\n")
+            _write_nested(fh, [f"Nowhere {i:06d}" for i in range(extra)], fanout, 2)
+        fh.write("Income:\n  Interest:\n    - Credit Interest\n")
+
+
+def _write_nested(fh, patterns, fanout, depth):
+    indent = "  " * depth
+    if len(patterns) <= fanout:
+        fh.writelines(f"{indent}- {pattern}\n" for pattern in patterns)
+        return
+    size = -(-len(patterns) // fanout)
+    for i in range(0, len(patterns), size):
+        fh.write(f"{indent}Group{i // size}:\n")
+        _write_nested(fh, patterns[i:i + size], fanout, depth + 1)
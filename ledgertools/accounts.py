@@ -1,21 +1,260 @@
 import click
+import hashlib
 import json
+import os
+import pickle
 import yaml
-from yaml import SafeLoader
 import re
+import sys
+from collections import OrderedDict
+
+from .beanfile import file_sha256, resolve_unknowns, scan_unknowns, unknown_entries
+from .suggest import Suggester
+from .util import CACHE_DIR
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+# number of descriptions to remember the account for
+CACHE_SIZE = 4096
+
+# bump this when the pickled AccountFile tables change shape
+CACHE_VERSION = 1
+
+# the index of past transactions used to suggest accounts
+SUGGEST_INDEX = os.path.join(CACHE_DIR, 'suggest.pickle')
+
+# characters which end the literal part of a pattern
+REGEX_SPECIALS = set('.^$*+?{}[]|()\\')
+REGEX_QUANTIFIERS = set('*+?{')
+
+
+def has_top_level_branch(pattern):
+    """True if the pattern has a `|` outside of any group or set."""
+    depth, in_set, escaped = 0, False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_set:
+            in_set = char != ']'
+        elif char == '[':
+            in_set = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+    return False
+
+
+def literal_prefix(pattern):
+    """Return the lower case literal text every match of the pattern must start with.
+
+    Stops at the first regex construct, or before a literal made optional by a
+    quantifier, and only keeps ascii characters.  An empty string means the pattern could match
+    anything.
+    """
+    if has_top_level_branch(pattern):
+        return ''
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            # an escaped punctuation character is a literal
+            char = pattern[i + 1]
+            i += 2
+        elif char in REGEX_SPECIALS:
+            break
+        else:
+            i += 1
+        if not char.isascii():
+            break
+        if i < len(pattern) and pattern[i] in REGEX_QUANTIFIERS:
+            break
+        prefix.append(char.lower())
+    return ''.join(prefix)
+
+
+class MerchantMatcher:
+    """The merchant patterns, compiled once, in the order they appear in the yaml.
+
+    The first pattern to match the start of a description wins.  A trie of each
+    pattern's literal prefix picks out the few patterns worth trying.
+    """
+    def __init__(self, merchant_accounts):
+        """param merchant_accounts: an ordered dictionary of merchant patterns to account names"""
+        self.patterns = [
+            (re.compile(pattern, re.IGNORECASE), account)
+            for pattern, account in merchant_accounts.items()
+        ]
+
+        # patterns without a literal prefix are tried on every description
+        self.wildcards = []
+        self.trie = dict()
+        for index, pattern in enumerate(merchant_accounts.keys()):
+            prefix = literal_prefix(pattern)
+            if not prefix:
+                self.wildcards.append(index)
+                continue
+            node = self.trie
+            for char in prefix:
+                node = node.setdefault(char, dict())
+            # the empty key holds the patterns ending at this node
+            node.setdefault('', []).append(index)
+
+    def candidates(self, description):
+        """Return the indexes, in order, of the patterns which might match the description"""
+        if not description.isascii():
+            # re's case folding reaches beyond ascii; try everything
+            return range(len(self.patterns))
+        result = list(self.wildcards)
+        node = self.trie
+        for char in description.lower():
+            node = node.get(char)
+            if node is None:
+                break
+            result.extend(node.get('', ()))
+        return sorted(result)
+
+    def match(self, description):
+        """Return the account of the first pattern matching the description"""
+        for index in self.candidates(description):
+            pattern, account = self.patterns[index]
+            if pattern.match(description):
+                return account
+        return None
+
+
+class MatchCache:
+    """A least recently used cache of description -> account, with statistics."""
+
+    # stands in for a cached "no account"
+    MISSING = object()
+
+    def __init__(self, size=CACHE_SIZE):
+        """param size: the most descriptions to remember; 0 disables the cache"""
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, description):
+        """Return the cached account (maybe None) or MISSING"""
+        account = self.entries.get(description, self.MISSING)
+        if account is self.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(description)
+        return account
+
+    def put(self, description, account):
+        if self.size <= 0:
+            return
+        self.entries[description] = account
+        self.entries.move_to_end(description)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self.entries))
 
 
 class AccountFile:
     """A yaml file which matches merchant regexes with account names.
     """
-    def __init__(self, filename):
-        """param filename: a yaml formatted file of mappings from accounts to merchants"""
+    def __init__(self, filename, cache_size=CACHE_SIZE, cache_dir=CACHE_DIR):
+        """param filename: a yaml formatted file of mappings from accounts to merchants
+        param cache_size: the number of matched descriptions to remember
+        param cache_dir: where to keep the parsed yaml between runs; None to always parse it
+        """
         self.filename = filename
-        with open(filename, 'r') as fh:
-            self.raw = yaml.load(fh, SafeLoader)
+        self.cache_dir = cache_dir
+        self.cache = MatchCache(cache_size)
+        self.reload()
 
+    def reload(self):
+        """Read the yaml file (again) and forget any remembered matches."""
+        tables = self._load_cached()
+        if tables is None:
+            with open(self.filename, 'rb') as fh:
+                content = fh.read()
+            raw = yaml.load(content, SafeLoader)
+            account_merchants, merchant_accounts = self._tables(raw)
+            tables = dict(
+                raw=raw,
+                account_merchants=account_merchants,
+                merchant_accounts=merchant_accounts,
+                matcher=MerchantMatcher(merchant_accounts),
+            )
+            self._save_cached(content, tables)
+
+        self.raw = tables['raw']
+        self._account_merchants = tables['account_merchants']
         # a dictionary of merchant patterns
-        self.merchant_accounts = self._merchant_accounts()
+        self.merchant_accounts = tables['merchant_accounts']
+        self.matcher = tables['matcher']
+        self.cache.clear()
+
+    @property
+    def _cache_filename(self):
+        key = hashlib.sha1(os.path.abspath(self.filename).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"accounts-{key}.pickle")
+
+    def _load_cached(self):
+        """Return the tables saved for this yaml file, or None if it has changed since."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_filename, 'rb') as fh:
+                cached = pickle.load(fh)
+            stat = os.stat(self.filename)
+            if cached['version'] != CACHE_VERSION:
+                return None
+            if (cached['mtime'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+                return cached['tables']
+            # touched, but maybe not changed
+            with open(self.filename, 'rb') as fh:
+                content = fh.read()
+            if cached['sha256'] == hashlib.sha256(content).hexdigest():
+                self._save_cached(content, cached['tables'])
+                return cached['tables']
+        except Exception:
+            # unreadable, or pickled by another version of the code; it's only a cache
+            pass
+        return None
+
+    def _save_cached(self, content, tables):
+        if self.cache_dir is None:
+            return
+        try:
+            stat = os.stat(self.filename)
+            cached = dict(
+                version=CACHE_VERSION,
+                mtime=stat.st_mtime_ns,
+                size=stat.st_size,
+                sha256=hashlib.sha256(content).hexdigest(),
+                tables=tables,
+            )
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_filename = f"{self._cache_filename}.{os.getpid()}.tmp"
+            with open(temp_filename, 'wb') as fh:
+                pickle.dump(cached, fh, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_filename, self._cache_filename)
+        except OSError:
+            # no cache this time
+            pass
 
     @staticmethod
     def _walk(names, merchants):
@@ -29,58 +268,70 @@ class AccountFile:
     @property
     def account_merchants(self):
         # return a dictionary of accounts
-        result = dict()
-        for account, merchants in AccountFile._walk([], self.raw):
-            result[account] = merchants
-        return result
+        return self._account_merchants
 
-    def _merchant_accounts(self):
-        # return a dictionary of merchants
-        result = dict()
-        for account, merchants in AccountFile._walk([], self.raw):
+    @staticmethod
+    def _tables(raw):
+        # return dictionaries of accounts and merchants from one walk of the yaml
+        account_merchants, merchant_accounts = dict(), dict()
+        for account, merchants in AccountFile._walk([], raw):
+            account_merchants[account] = merchants
             for merchant in merchants:
-                result[str(merchant)] = account
-        return result
+                merchant_accounts[str(merchant)] = account
+        return account_merchants, merchant_accounts
 
     def match(self, description):
         """Return the account matching the description"""
-        if description is not None:
-            for pattern in self.merchant_accounts.keys():
-                if re.match(pattern, description, re.IGNORECASE):
-                    return self.merchant_accounts[pattern]
-        return None
+        if description is None:
+            return None
+        account = self.cache.get(description)
+        if account is MatchCache.MISSING:
+            account = self.matcher.match(description)
+            self.cache.put(description, account)
+        return account
 
+    def match_many(self, descriptions):
+        """Return the accounts matching each of the descriptions, in the same order.
 
-def find_unknown_merchants(rawfile, accountfile):
-    """From the download, list the most unknown transactions.
+        Each unique description is only matched once.  An item may also be a tuple
+        of alternatives, eg: (description, raw_text), the first to match wins.
+        """
+        found = dict()
+        result = []
+        for item in descriptions:
+            alternatives = item if isinstance(item, tuple) else (item,)
+            account = None
+            for description in alternatives:
+                if description not in found:
+                    found[description] = self.match(description)
+                account = found[description]
+                if account is not None:
+                    break
+            result.append(account)
+        return result
 
-    * load the download file and the accounts yaml
-    * list the transactions without an account in frequency order.
-    """
-    print()
-    accounts = AccountFile(accountfile)
-    raw_data = json.load(open(rawfile))
-
-    unknowns, knowns = dict(), set()
-    for item in raw_data:
-        raw_text = item['attributes']['rawText']
-        description = item['attributes']['description']
-        full_description = f"{item['attributes']['description']} \"{item['attributes']['rawText']}\""
-        account = accounts.match(description) or accounts.match(raw_text)
-        if account is None:
-            unknowns.setdefault(full_description, list()).append(item)
-        else:
-            knowns.add("%-50s -> %s" % (full_description, account))
 
-    unknowns_list = sorted(unknowns.keys(), key=lambda key: len(unknowns[key]), reverse=True)
-    for description in unknowns_list:
-        values = [trans['attributes']['amount']['value'] for trans in unknowns[description]]
-        values_str = ", ".join(values)
-        print(f"{len(unknowns[description])} {description} -> {values_str}")
+def find_unknown_merchants(rawfiles, accountfile, top=None, by='count', fmt='text', out=None):
+    """From the downloads, list the merchants of the most transactions without an account.
 
-    print()
-    for known in sorted(knowns):
-        print(known)
+    * stream the downloads (Up json or ndjson, St George csv) and the accounts yaml
+    * list the merchants without an account in frequency (or money) order.
+
+    Args:
+        rawfiles: a filename, or a list of them.
+        top: how many merchants to list; or None for all.
+        by: "count" or "total"; what to rank the merchants by.
+        fmt: "text", "json" or "csv".
+        out: text stream to write to; stdout by default.
+    """
+    # the report reads St George files, and stgeorge needs this module
+    from .report import UnknownMerchantReport
+
+    report = UnknownMerchantReport(AccountFile(accountfile))
+    for rawfile in [rawfiles] if isinstance(rawfiles, str) else rawfiles:
+        report.add_file(rawfile)
+    report.write(out or sys.stdout, top, by, fmt)
+    return report
 
 
 @click.group()
@@ -88,30 +339,80 @@ def cli():
     pass
 
 
-unknown_str = '    ACCOUNT_UNKNOWN'
-
-
 @cli.command()
 @click.argument("beanfile", type=click.Path(exists=True))
-def unknowns(beanfile):
-    """Resolve the unknown transactions.
+@click.option("--json", "as_json", is_flag=True, help="One json object per unknown posting.")
+def unknowns(beanfile, as_json):
+    """List the unknown postings: the offset of the account, date, amount and narration.
+
+    The first line is the sha256 of the beanfile, for resolve to check the offsets
+    against; with --json it goes to stderr.
     """
-    # Find the unknown transactions
-    lines = open(beanfile)
-    buffer = []
-    for line in lines:
-        line = line.strip('\n')
-        if line != '':
-            buffer.append(line)
+    click.echo(f"# sha256 {file_sha256(beanfile)}", err=as_json)
+    for unknown in scan_unknowns(beanfile):
+        if as_json:
+            click.echo(json.dumps(unknown._asdict()))
         else:
-            if len(buffer) > 1 and re.search(unknown_str, buffer[2]):
-                click.echo('\n'.join(buffer))
-                description = re.search('\".*\"', buffer[0])
-                bracketed_description = re.search("\[.*\]", description.group())
-                click.echo(description.group())
-                click.echo(bracketed_description.group())
-            click.echo('\n')
-            buffer.clear()
+            click.echo(f"{unknown.account_offset:>10} {unknown.date} {unknown.amount:>10} \"{unknown.narration}\"")
+
+
+@cli.command()
+@click.argument("beanfile", type=click.Path(exists=True, dir_okay=False))
+@click.argument("edits", type=click.File())
+@click.option("--sha256", help="The sha256 of the beanfile when the offsets were listed; "
+                                "by default the '# sha256' line of the EDITS.")
+def resolve(beanfile, edits, sha256):
+    """Give unknown postings their accounts, from EDITS lines of: offset account.
+
+    The offsets are those listed by unknowns; - reads the edits from stdin.
+    """
+    changes = []
+    for line in edits:
+        if line.startswith('# sha256 ') and sha256 is None:
+            sha256 = line.split()[2]
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        try:
+            offset, account = line.split()
+            changes.append((int(offset), account))
+        except ValueError:
+            raise click.UsageError(f"Expected an offset and an account, not: {line.strip()}")
+    try:
+        count = resolve_unknowns(beanfile, changes, sha256)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    click.echo(f"{count} postings resolved.")
+
+
+@cli.command()
+@click.argument("accountfile", metavar="ACCOUNTS", type=click.Path(exists=True))
+@click.argument("rawfiles", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--top", type=int, default=20, help="How many merchants to list; 0 for all.")
+@click.option("--by", type=click.Choice(["count", "total"]), default="count", help="Rank by transactions, or money.")
+@click.option("--format", "fmt", type=click.Choice(["text", "json", "csv"]), default="text")
+def report(accountfile, rawfiles, top, by, fmt):
+    """List the merchants of the most transactions without an account, from Up and St George downloads.
+    """
+    find_unknown_merchants(rawfiles, accountfile, top or None, by, fmt)
+
+
+@cli.command()
+@click.argument("beanfiles", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--index", default=SUGGEST_INDEX, help="Where to keep the index of past transactions.")
+@click.option("--top", default=3, help="How many accounts to suggest.")
+def suggest(beanfiles, index, top):
+    """Suggest accounts for the unknown transactions, from the known ones.
+    """
+    suggester = Suggester.load(index)
+    for filename in beanfiles:
+        suggester.learn_file(filename)
+    suggester.save(index)
+
+    for filename in beanfiles:
+        for entry in unknown_entries(filename):
+            click.echo(f"{entry.date} \"{entry.narration}\"")
+            for account, score in suggester.suggest_entry(entry, top):
+                click.echo(f"    {score:.2f} {account}")
 
 # ok now I got the description
 # i need to match that with something in a file of matchables?
@@ -0,0 +1,142 @@
+"""Up Bank API, for asyncio.
+
+The same calls as UpbankClient, but many of them can be in flight at once; eg: the
+transactions of every account, each split into date windows.  Requests go through
+the pooled, retrying session and the scheduler of an UpbankClient, on worker
+threads, with no more than `concurrency` of them in flight.
+"""
+import asyncio
+import datetime
+
+from .scheduler import BULK, INTERACTIVE
+from .upclient import UpbankClient, URL, PAGE_SIZE, POOL_SIZE, date_windows
+
+# Requests in flight at once.
+CONCURRENCY = 8
+
+
+class AsyncUpbankClient:
+    def __init__(self, token: str, url: str = URL, concurrency: int = CONCURRENCY, **kwargs):
+        """
+        token: str: upbank "personal access token" from https://api.up.com.au/getting_started
+        url: str: the base of the Up API.
+        concurrency: int: the most requests to have in flight at once.
+        kwargs: passed to UpbankClient; eg: retries, backoff, timeout.
+        """
+        self.client = UpbankClient(token, url, pool_size=max(concurrency, POOL_SIZE), **kwargs)
+        self.concurrency = concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # made on first use, inside the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _request(self, uri: str, params: dict = None, priority: int = BULK):
+        async with self.semaphore:
+            return await asyncio.to_thread(self.client.send, uri, params, priority)
+
+    async def iter_get(self, path: str, params: dict = None, priority: int = BULK):
+        """Send GET requests to Up, following the pages, yielding the data of each page.
+
+        Args:
+            path: includes the preceding slash.
+            params: request parameters.
+        """
+        uri = f"{self.client.url}{path}"
+        while uri is not None:
+            response = await self._request(uri, params, priority)
+            response.raise_for_status()
+            data = response.json()
+            for item in data["data"]:
+                yield item
+            # the next link carries the params along
+            params = None
+            try:
+                uri = data["links"]["next"]
+            except KeyError:
+                break
+
+    async def get(self, path: str, params: dict = None, priority: int = BULK) -> list:
+        """Send a GET request to Up.
+
+        Returns:
+            list of data from every page; probably dicts.
+        """
+        return [item async for item in self.iter_get(path, params, priority)]
+
+    async def transactions(
+        self,
+        since: datetime.datetime,
+        until: datetime.datetime = None,
+        status: str = None,
+        account_id: str = None,
+        window: str = None,
+    ) -> list:
+        """Fetch a list of transactions, newest first.
+
+        Args:
+            since: tzaware datetime to start from
+            until: tzaware datetime to stop at; or None for all.
+            status: "HELD" or "SETTLED"
+            account_id: just the transactions of this account; or None for all.
+            window: MONTH or WEEK to fetch date windows at once; or None to page through in turn.
+        """
+        if window is not None:
+            if until is None:
+                until = datetime.datetime.now(since.tzinfo)
+            pages = await asyncio.gather(*(
+                self.transactions(start, end, status, account_id)
+                for start, end in reversed(date_windows(since, until, window))
+            ))
+            result, seen = [], set()
+            for page in pages:
+                for transaction in page:
+                    if transaction["id"] not in seen:
+                        seen.add(transaction["id"])
+                        result.append(transaction)
+            return result
+
+        params = {"page[size]": PAGE_SIZE, "filter[since]": since}
+        if until is not None:
+            params["filter[until]"] = until
+        if status is not None:
+            params["filter[status]"] = status
+        path = "/transactions" if account_id is None else f"/accounts/{account_id}/transactions"
+        return await self.get(path, params)
+
+    async def account_transactions(
+        self,
+        since: datetime.datetime,
+        until: datetime.datetime = None,
+        status: str = None,
+        window: str = None,
+    ) -> dict:
+        """Fetch the transactions of every account at once.
+
+        Returns:
+            dict of account id -> list of transactions.
+        """
+        accounts = await self.accounts()
+        results = await asyncio.gather(*(
+            self.transactions(since, until, status, account["id"], window) for account in accounts
+        ))
+        return {account["id"]: result for account, result in zip(accounts, results)}
+
+    async def ping(self):
+        """Verify the access token is working.
+
+        Returns:
+            requests.Response
+        """
+        return await self._request(f"{self.client.url}/util/ping", priority=INTERACTIVE)
+
+    async def accounts(self) -> list:
+        """Fetch a list of accounts."""
+        return await self.get("/accounts", priority=INTERACTIVE)
+
+    async def categories(self) -> list:
+        """Fetch a list of categories."""
+        return await self.get("/categories", priority=INTERACTIVE)
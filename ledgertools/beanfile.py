@@ -0,0 +1,221 @@
+"""Read the transactions of a beancount file as text.
+
+The beancount parser gives up at the first `ACCOUNT_UNKNOWN [category]` posting
+which we generate for unknown transactions, so these routines read the
+transaction blocks directly, keeping the byte offset of each one.
+"""
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import shutil
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+# accounts given to transactions which still need an account
+UNKNOWN_ACCOUNTS = ('ACCOUNT_UNKNOWN', 'Expenses:TODO')
+
+TRANSACTION_REGEX = re.compile(r'(\d{4}-\d\d-\d\d)\s+(?:\*|!|txn)\s+((?:"[^"]*"\s*)+)')
+NARRATION_REGEX = re.compile(r'"([^"]*)"')
+POSTING_REGEX = re.compile(r'\s+([A-Z][\w\-:]*)(?:\s+\[[^\]]*\])?(?:\s+(-?[\d,.]+)\s+([A-Z]+))?')
+# an unknown account, its category, and the space up to the amount
+UNKNOWN_POSTING_REGEX = re.compile(
+    b'(?:' + b'|'.join(re.escape(account.encode()) for account in UNKNOWN_ACCOUNTS) + rb')(?![\w:\-])(?:[ \t]+\[[^\]\n]*\])?[ \t]*'
+)
+META_REGEX = re.compile(r'\s+([a-z][\w\-]*):\s+"?([^"\r\n]*)"?')
+
+
+class Posting(NamedTuple):
+    account: str
+    # the number as written, or '' when left for beancount to fill in
+    amount: str
+    # byte offset of the account name in the file
+    offset: int
+
+
+class Entry(NamedTuple):
+    # byte offset of the first line of the transaction
+    offset: int
+    date: str
+    narration: str
+    postings: list
+    # key: value lines of the transaction; eg: source_id
+    meta: dict
+
+    @property
+    def is_unknown(self):
+        return any(posting.account in UNKNOWN_ACCOUNTS for posting in self.postings)
+
+
+class Unknown(NamedTuple):
+    # byte offset of the first line of the transaction
+    offset: int
+    date: str
+    narration: str
+    account: str
+    # byte offset of the unknown account name
+    account_offset: int
+    # the amount of the posting; if it has none, the balance of the others
+    amount: str
+
+
+def read_entries(content, offset=0):
+    """Yield the transactions in the content of a beancount file.
+
+    param content: bytes from a beancount file; starting at a line.
+    param offset: the position in the file of the content.
+    """
+    entry = None
+    for line in content.splitlines(keepends=True):
+        text = line.decode('utf-8', 'replace')
+        if entry is not None and text[:1] in (' ', '\t'):
+            posting = POSTING_REGEX.match(text)
+            if posting is not None:
+                position = offset + len(text[:posting.start(1)].encode('utf-8'))
+                entry.postings.append(Posting(posting.group(1), posting.group(2) or '', position))
+            elif (meta := META_REGEX.match(text)) is not None:
+                entry.meta[meta.group(1)] = meta.group(2)
+        else:
+            if entry is not None:
+                yield entry
+                entry = None
+            header = TRANSACTION_REGEX.match(text)
+            if header is not None:
+                narration = " ".join(NARRATION_REGEX.findall(header.group(2)))
+                entry = Entry(offset, header.group(1), narration, [], {})
+        offset += len(line)
+    if entry is not None:
+        yield entry
+
+
+def posting_amount(entry, posting):
+    """Return the amount of a posting, or for one without, the balance of the others."""
+    if posting.amount:
+        return posting.amount
+    others = [other.amount for other in entry.postings if other is not posting]
+    if not others or not all(others):
+        return ''
+    try:
+        return str(-sum(Decimal(amount.replace(',', '')) for amount in others))
+    except InvalidOperation:
+        return ''
+
+
+def scan_unknowns(filename):
+    """Yield an Unknown for each posting to an unknown account in a beancount file.
+
+    The file is memory mapped and searched for the unknown accounts, and only the
+    transactions around them are read.
+    """
+    for entry in unknown_entries(filename):
+        for posting in entry.postings:
+            if posting.account in UNKNOWN_ACCOUNTS:
+                yield Unknown(entry.offset, entry.date, entry.narration,
+                              posting.account, posting.offset, posting_amount(entry, posting))
+
+
+def unknown_entries(filename):
+    """Yield each transaction of a beancount file with a posting to an unknown account; see scan_unknowns()."""
+    with open(filename, 'rb') as fh:
+        if not fh.seek(0, 2):
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            block_end = 0
+            for hit in heapq.merge(*(find_all(mm, account.encode()) for account in UNKNOWN_ACCOUNTS)):
+                if hit < block_end:
+                    # in the transaction just read
+                    continue
+                line_start = mm.rfind(b'\n', 0, hit) + 1
+                if line_start == hit or mm[line_start:hit].strip(b' \t'):
+                    # not a posting; eg: a comment, or in a narration
+                    continue
+                block_start, block_end = transaction_block(mm, line_start)
+                for entry in read_entries(mm[block_start:block_end], block_start):
+                    if entry.is_unknown:
+                        yield entry
+
+
+def find_all(mm, text):
+    """Yield the offset of each occurrence of text."""
+    position = mm.find(text)
+    while position >= 0:
+        yield position
+        position = mm.find(text, position + len(text))
+
+
+def transaction_block(mm, line_start):
+    """Return the start and end of the transaction with a posting on the line starting at line_start."""
+    start = line_start
+    while start > 0 and mm[start:start + 1] in (b' ', b'\t'):
+        start = mm.rfind(b'\n', 0, start - 1) + 1
+    end = line_start
+    while True:
+        newline = mm.find(b'\n', end)
+        if newline < 0:
+            return start, len(mm)
+        end = newline + 1
+        if mm[end:end + 1] not in (b' ', b'\t'):
+            return start, end
+
+
+def file_sha256(filename):
+    """Return the hex digest of a file, for resolve_unknowns() to check against."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fh:
+        while block := fh.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resolve_unknowns(filename, edits, sha256=None):
+    """Give unknown postings their accounts, in one pass over the file.
+
+    The file is copied to a temporary file with the edits made, which then
+    replaces it.
+
+    Args:
+        filename: the beancount file.
+        edits: (byte offset of an unknown account, the account) pairs; see scan_unknowns().
+        sha256: the hex digest of the file the offsets were taken from; or None.
+
+    Returns:
+        the number of postings changed.
+    """
+    edits = sorted(edits)
+    if not edits:
+        return 0
+    temp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(filename, 'rb') as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if sha256 is not None and hashlib.sha256(mm).hexdigest() != sha256:
+                raise ValueError(f"{filename} has changed since the offsets were taken.")
+            replacements = []
+            for offset, account in edits:
+                old = UNKNOWN_POSTING_REGEX.match(mm, offset)
+                line_start = mm.rfind(b'\n', 0, offset) + 1
+                if old is None or line_start == offset or mm[line_start:offset].strip(b' \t'):
+                    # not the account of a posting; eg: a word of a narration
+                    raise ValueError(f"There is no unknown account at offset {offset} of {filename}.")
+                if replacements and offset < replacements[-1][1]:
+                    raise ValueError(f"Offset {offset} is given more than once.")
+                new = account.encode()
+                if mm[old.end():old.end() + 1] not in (b'\n', b'\r', b''):
+                    # keep the amount, or comment, where it was if there is room
+                    new = new.ljust(len(old.group()) - 2) + b'  '
+                replacements.append((offset, old.end(), new))
+
+            try:
+                with open(temp_filename, 'wb') as out:
+                    position = 0
+                    for start, end, new in replacements:
+                        out.write(mm[position:start])
+                        out.write(new)
+                        position = end
+                    out.write(mm[position:])
+            except BaseException:
+                os.remove(temp_filename)
+                raise
+    shutil.copymode(filename, temp_filename)
+    os.replace(temp_filename, filename)
+    return len(replacements)
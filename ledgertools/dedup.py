@@ -0,0 +1,107 @@
+"""Spot the transactions already in the ledger, so importing an export again doesn't double them.
+
+Each transaction of the ledger is remembered by the bank's id for it (the
+`source_id` the Up importer writes), or failing that by a fingerprint of its bank
+account, date, amount and narration.  The index is kept in a file beside the
+ledger, and only the transactions appended since are read the next time.
+"""
+import os
+import re
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from .ledger_index import LedgerIndex
+
+# the metadata key of the bank's id for a transaction
+SOURCE_ID = 'source_id'
+
+WORD_REGEX = re.compile(r'[a-z0-9]+')
+
+
+def fingerprint(bank_account, date, amount, narration) -> str:
+    """Return the key of a transaction without an id.
+
+    Args:
+        bank_account: the account the transaction came from.
+        date: the date, or its yyyy-mm-dd.
+        amount: the change to the bank account; Decimal or str.
+        narration: only its words count; eg: "RAW [desc]" is "RAW desc".
+    """
+    try:
+        amount = f"{Decimal(str(amount).replace(',', '')):.2f}"
+    except InvalidOperation:
+        amount = ''
+    return f"{bank_account}|{date}|{amount}|{' '.join(WORD_REGEX.findall(narration.lower()))}"
+
+
+def entry_keys(entry):
+    """Return the (source id, fingerprint) of an Entry read from the ledger.
+
+    The first posting is the bank account; without an amount it is the balance of
+    the others.
+    """
+    if not entry.postings:
+        return entry.meta.get(SOURCE_ID), None
+    bank, *others = entry.postings
+    amount = bank.amount
+    if not amount and others and all(posting.amount for posting in others):
+        amount = -sum(Decimal(posting.amount.replace(',', '')) for posting in others)
+    return entry.meta.get(SOURCE_ID), fingerprint(bank.account, entry.date, amount, entry.narration)
+
+
+def index_filename(ledger):
+    """Return where the index of a ledger is kept; beside it."""
+    directory, name = os.path.split(os.path.abspath(ledger))
+    return os.path.join(directory, f".{name}.dedup")
+
+
+class DuplicateIndex(LedgerIndex):
+    """The ids, and fingerprints, of the transactions in the ledger."""
+
+    def __init__(self):
+        super().__init__()
+        self.ids = set()
+        # a fingerprint may be in the ledger more than once; eg: two coffees in a day
+        self.fingerprints = Counter()
+
+    def add(self, source_id, fingerprint):
+        if source_id is not None:
+            self.ids.add(source_id)
+        elif fingerprint is not None:
+            self.fingerprints[fingerprint] += 1
+
+    def learn_entries(self, entries):
+        for entry in entries:
+            self.add(*entry_keys(entry))
+
+    def is_duplicate(self, source_id, fingerprint, claimed) -> bool:
+        """True if the transaction is in the ledger.
+
+        Args:
+            source_id: the bank's id for it, or None.
+            fingerprint: see fingerprint().
+            claimed: a Counter of the fingerprints matched so far in this import; a
+                fingerprint in the ledger n times is a duplicate n times.
+        """
+        if source_id is not None and source_id in self.ids:
+            return True
+        if claimed[fingerprint] < self.fingerprints.get(fingerprint, 0):
+            claimed[fingerprint] += 1
+            return True
+        return False
+
+    def duplicates(self, keys) -> list:
+        """Return whether each of the (source id, fingerprint) keys is in the ledger."""
+        claimed = Counter()
+        return [self.is_duplicate(source_id, fingerprint, claimed) for source_id, fingerprint in keys]
+
+    @classmethod
+    def for_ledger(cls, ledger):
+        """Return the index of a ledger, brought up to date with it, and saved beside it."""
+        filename = index_filename(ledger)
+        index = cls.load(filename)
+        sources = dict(index.sources)
+        index.learn_file(ledger)
+        if index.sources != sources:
+            index.save(filename)
+        return index
@@ -0,0 +1,73 @@
+"""An index of the transactions in beancount files, kept up to date as they grow.
+
+Suggester and DuplicateIndex learn the transactions of the ledger this way.  Only
+the transactions appended to a file since it was last learnt are read; a file
+changed in any other way is learnt again from the start.  The index is pickled
+between runs.
+"""
+import hashlib
+import os
+import pickle
+
+from . import beanfile
+
+
+class LedgerIndex:
+    """The shared bookkeeping; subclasses learn the entries."""
+
+    # bump this in a subclass when its pickled index changes shape
+    VERSION = 1
+
+    def __init__(self):
+        # filename -> (bytes learnt, sha256 of those bytes)
+        self.sources = dict()
+
+    def learn_entries(self, entries):
+        """Add the beanfile.Entry of each transaction to the index."""
+        raise NotImplementedError
+
+    def learn_file(self, filename):
+        """Learn the transactions of a beancount file.
+
+        Only the transactions appended since the file was last learnt are read.  If
+        the file has been changed in some other way, every source is learnt again.
+
+        Returns:
+            the number of bytes read.
+        """
+        with open(filename, 'rb') as fh:
+            content = fh.read()
+        filename = os.path.abspath(filename)
+        learnt, digest = self.sources.get(filename, (0, None))
+        if learnt and (len(content) < learnt or hashlib.sha256(content[:learnt]).hexdigest() != digest):
+            return self.rebuild()
+        self.learn_entries(beanfile.read_entries(content[learnt:], learnt))
+        self.sources[filename] = (len(content), hashlib.sha256(content).hexdigest())
+        return len(content) - learnt
+
+    def rebuild(self):
+        """Forget everything and learn all the sources again."""
+        sources = list(self.sources)
+        self.__init__()
+        return sum(self.learn_file(filename) for filename in sources if os.path.exists(filename))
+
+    def save(self, filename):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'wb') as fh:
+            pickle.dump((self.VERSION, self.__dict__), fh, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Return the index saved in filename, or an empty one."""
+        index = cls()
+        try:
+            with open(filename, 'rb') as fh:
+                version, state = pickle.load(fh)
+            if version == cls.VERSION:
+                index.__dict__.update(state)
+        except Exception:
+            # unreadable, or pickled by another version of the code; learn it again
+            pass
+        return index
@@ -0,0 +1,119 @@
+"""Which merchants most need an account in accounts.yaml, across any number of downloads.
+
+Up downloads (json or ndjson) and St George csv files are streamed, and only a
+running total is kept for each merchant without an account.
+"""
+import csv
+import heapq
+import json
+from decimal import Decimal
+
+from .stgeorge import StGeorgeFile
+from .transaction import from_upbank
+from .upfile import GZIP_MAGIC, UpFile
+from .util import BATCH_SIZE, batches
+
+FORMATS = ('text', 'json', 'csv')
+
+# what to rank the merchants by
+ORDERS = ('count', 'total')
+
+FIELDS = ('merchant', 'count', 'total', 'first', 'last', 'raw_text')
+
+
+class MerchantTotal:
+    """The transactions of a merchant, totalled."""
+    __slots__ = FIELDS
+
+    def __init__(self, merchant, raw_text):
+        self.merchant = merchant
+        # an example of how the bank describes them
+        self.raw_text = raw_text
+        self.count = 0
+        self.total = Decimal(0)
+        self.first = self.last = None
+
+    def add(self, transaction):
+        self.count += 1
+        self.total += transaction.amount
+        if self.first is None or transaction.date < self.first:
+            self.first = transaction.date
+        if self.last is None or transaction.date > self.last:
+            self.last = transaction.date
+
+    def as_dict(self):
+        return dict(
+            merchant=self.merchant,
+            count=self.count,
+            total=str(self.total),
+            first=self.first.isoformat(),
+            last=self.last.isoformat(),
+            raw_text=self.raw_text,
+        )
+
+
+def read_transactions(filename):
+    """Yield the Transactions of an Up download, or a St George csv, oldest first."""
+    with open(filename, 'rb') as fh:
+        head = fh.read(64).lstrip()
+    if head.startswith(GZIP_MAGIC) or head[:1] in (b'[', b'{'):
+        with UpFile(filename) as transactions:
+            yield from map(from_upbank, transactions)
+    else:
+        with StGeorgeFile(filename) as thefile:
+            yield from thefile.transactions()
+
+
+class UnknownMerchantReport:
+    """Totals of the transactions without an account, by merchant."""
+
+    def __init__(self, accounts):
+        """
+        accounts: AccountFile: the account->merchant mappings.
+        """
+        self.accounts = accounts
+        # merchant -> MerchantTotal
+        self.merchants = dict()
+        self.transactions = 0
+        self.unknowns = 0
+
+    def add_file(self, filename):
+        """Add the transactions of a download without an account."""
+        for batch in batches(read_transactions(filename), BATCH_SIZE):
+            matches = self.accounts.match_many((transaction.merchant, transaction.raw_text) for transaction in batch)
+            self.transactions += len(batch)
+            for transaction, account in zip(batch, matches):
+                if account is not None:
+                    continue
+                self.unknowns += 1
+                merchant = self.merchants.get(transaction.merchant)
+                if merchant is None:
+                    merchant = self.merchants[transaction.merchant] = MerchantTotal(
+                        transaction.merchant, transaction.raw_text)
+                merchant.add(transaction)
+
+    def top(self, k=None, by='count'):
+        """Return the k merchants with the most transactions, or the most money; all for None."""
+        if by == 'count':
+            key = lambda merchant: (merchant.count, abs(merchant.total), merchant.merchant)
+        else:
+            key = lambda merchant: (abs(merchant.total), merchant.count, merchant.merchant)
+        if k is None:
+            return sorted(self.merchants.values(), key=key, reverse=True)
+        return heapq.nlargest(k, self.merchants.values(), key=key)
+
+    def write(self, out, k=None, by='count', fmt='text'):
+        """Write the top k merchants to a text stream, as text, json or csv."""
+        merchants = self.top(k, by)
+        if fmt == 'json':
+            json.dump([merchant.as_dict() for merchant in merchants], out, indent=2)
+            out.write('\n')
+        elif fmt == 'csv':
+            writer = csv.DictWriter(out, FIELDS)
+            writer.writeheader()
+            writer.writerows(merchant.as_dict() for merchant in merchants)
+        else:
+            out.write(f"{self.unknowns} of {self.transactions} transactions have no account.\n")
+            for merchant in merchants:
+                out.write(f"{merchant.count:>5} {merchant.total:>10} {merchant.first} {merchant.last} "
+                          f"{merchant.merchant} \"{merchant.raw_text}\"\n")
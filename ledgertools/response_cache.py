@@ -0,0 +1,70 @@
+"""Keep the responses of the slow changing Up endpoints for a while.
+
+UpbankClient takes any object with the get/set/delete/clear methods of
+ResponseCache; FileResponseCache keeps them as json files on disk.
+"""
+import json
+import os
+import time
+
+from .util import CACHE_DIR
+
+
+class ResponseCache:
+    """Remember data under a key until it expires; in memory."""
+
+    def __init__(self):
+        self.entries = dict()
+
+    def get(self, key):
+        """Return the data saved under the key, or None if there is none or it has expired."""
+        expires, data = self.entries.get(key, (0, None))
+        return data if expires > time.time() else None
+
+    def set(self, key, data, ttl):
+        """Save the data under the key, for ttl seconds."""
+        self.entries[key] = (time.time() + ttl, data)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class FileResponseCache(ResponseCache):
+    """Remember data as a json file per key, in a directory."""
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'upbank')):
+        self.directory = directory
+
+    def _filename(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._filename(key)) as fh:
+                cached = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return cached['data'] if cached['expires'] > time.time() else None
+
+    def set(self, key, data, ttl):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_filename = f"{self._filename(key)}.{os.getpid()}.tmp"
+        with open(temp_filename, 'w') as fh:
+            json.dump({'expires': time.time() + ttl, 'data': data}, fh)
+        os.replace(temp_filename, self._filename(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._filename(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                os.remove(os.path.join(self.directory, filename))
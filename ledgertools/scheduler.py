@@ -0,0 +1,155 @@
+"""Pace the requests to Up, so big downloads don't get throttled.
+
+A token bucket, shared by every client in the process, hands out requests in
+order of priority: the interactive ones (ping, balance) ahead of bulk paging.
+The rate backs off when Up answers 429, or says it has little budget left, and
+creeps back up while requests succeed.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Priorities; lower goes first.
+INTERACTIVE = 0
+BULK = 1
+
+# Requests per second to start at, and to stay between.
+RATE = 10.0
+MIN_RATE = 0.5
+MAX_RATE = 20.0
+
+# Requests which may be sent at once after a quiet spell.
+BURST = 10
+
+# Requests per second added back after each success.
+RECOVERY = 0.1
+
+# Seconds to pause after a 429 without a Retry-After header.
+THROTTLE_PAUSE = 1.0
+
+
+class RequestMetrics:
+    """Totals of request latency, and of time spent waiting on the scheduler."""
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+        self.waited = 0.0
+        self.max_waited = 0.0
+        # the parallel windows record from their own threads
+        self._lock = threading.Lock()
+
+    def record(self, path, status, latency, waited):
+        with self._lock:
+            self.requests += 1
+            self.throttled += status == 429
+            self.latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.waited += waited
+            self.max_waited = max(self.max_waited, waited)
+        log.debug("GET %s %s latency %.3fs waited %.3fs", path, status, latency, waited)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(
+                requests=self.requests,
+                throttled=self.throttled,
+                mean_latency=self.latency / self.requests if self.requests else 0.0,
+                max_latency=self.max_latency,
+                mean_waited=self.waited / self.requests if self.requests else 0.0,
+                max_waited=self.max_waited,
+            )
+
+
+class RequestScheduler:
+    """A token bucket of requests, handed out by priority, which adapts to Up's rate limits."""
+
+    def __init__(self, rate=RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # no requests until then
+        self.paused_until = 0.0
+        self.metrics = RequestMetrics()
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._tickets = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=BULK) -> float:
+        """Wait for a turn to send a request.
+
+        Returns:
+            the seconds waited.
+        """
+        start = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] != ticket:
+                        # someone more important, or earlier, goes first
+                        self._condition.wait()
+                        continue
+                    if now < self.paused_until:
+                        self._condition.wait(self.paused_until - now)
+                    elif self.tokens < 1:
+                        self._condition.wait((1 - self.tokens) / self.rate)
+                    else:
+                        self.tokens -= 1
+                        return now - start
+            finally:
+                # served, or interrupted; either way the next in line goes
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def update(self, response):
+        """Adjust the pace to the response's status and rate limit headers."""
+        headers = response.headers
+        with self._condition:
+            now = time.monotonic()
+            if response.status_code == 429:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = 0.0
+                self.paused_until = max(self.paused_until, now + retry_after(headers, THROTTLE_PAUSE))
+            else:
+                self.rate = min(self.max_rate, self.rate + RECOVERY)
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            if remaining is not None and remaining.isdigit():
+                self.tokens = min(self.tokens, float(remaining))
+                if int(remaining) == 0:
+                    self.paused_until = max(self.paused_until, now + retry_after(headers, THROTTLE_PAUSE, "X-RateLimit-Reset"))
+            self._condition.notify_all()
+
+
+def retry_after(headers, default, name="Retry-After") -> float:
+    """Return the seconds to wait from a header of seconds, or of epoch seconds."""
+    try:
+        seconds = float(headers.get(name))
+    except (TypeError, ValueError):
+        return default
+    if seconds > 1e9:
+        seconds -= time.time()
+    return max(seconds, 0.0)
+
+
+# Shared by every client, unless they are given their own.
+SCHEDULER = RequestScheduler()
@@ -1,8 +1,24 @@
+import collections
+import concurrent.futures
 import csv
 import datetime
+import functools
+import glob
+import heapq
+import itertools
+import mmap
+import os
 import re
 
+from decimal import Decimal
+
+import click
+import yaml
+
 from . import accounts
+from .dedup import DuplicateIndex, fingerprint
+from .transaction import Transaction
+from .util import BATCH_SIZE, batches
 
 
 class StGeorgeFile:
@@ -14,10 +30,10 @@ class StGeorgeFile:
     SECOND_COL = 35
 
     # time is in this format '00:00 '
-    TIME_REGEX = r'\d\d:\d\d\s\S'
+    TIME_REGEX = re.compile(r'\d\d:\d\d\s\S')
 
     # the descriptions that need work
-    DESCRIPTION_TYPES = [
+    DESCRIPTION_TYPES = frozenset([
         "Eftpos Purchase",
         "Visa Purchase",
         "Visa Purchase O/Seas",
@@ -30,7 +46,10 @@ class StGeorgeFile:
         "Eftpos Refund",
         "Eftpos Debit",
         "Osko Withdrawal",
-    ]
+    ])
+
+    # the empty components of a direct transaction
+    NO_COMPONENTS = ('',) * 4
 
     def __init__(self, filename):
         self.filename = filename
@@ -45,58 +64,100 @@ class StGeorgeFile:
         self.fileobj.seek(0)
         # sniff for the header and discard it
         self.has_header = csv.Sniffer().has_header(temp_lines)
+        # where the rows start, in bytes, for reading the file backwards
+        self.data_start = 0
         if self.has_header:
             self.fileobj.readline()
+            with open(self.filename, 'rb') as fh:
+                self.data_start = len(fh.readline())
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.fileobj.close()
 
     def __iter__(self):
-        lines = [l for l in csv.reader(self.fileobj, self.dialect)]
-        for row in reversed(lines):
+        """Yield the parsed rows oldest first; the reverse of the file."""
+        return self._parsed_rows(csv.reader(self._reversed_lines(), self.dialect))
+
+    def forward(self):
+        """Yield the parsed rows in the order of the file; newest first."""
+        return self._parsed_rows(csv.reader(self.fileobj, self.dialect))
+
+    def transactions(self):
+        """Yield the rows as Transactions, oldest first."""
+        for row in csv.reader(self._reversed_lines(), self.dialect):
+            if not len(row):
+                continue
+            parsed = self._parsed(row)
+            yield Transaction(
+                date=parse_date(row[0]),
+                amount=Decimal(row[3] or 0) - Decimal(row[2] or 0),
+                merchant=parsed[1],
+                raw_text=row[1],
+                category=row[5] if len(row) > 5 else '',
+                source_id=None,
+            )
+
+    def _parsed_rows(self, rows):
+        for row in rows:
             # skip blank rows
             if not len(row):
                 continue
             yield self._parsed(row)
 
+    def _reversed_lines(self):
+        """Yield the lines after the header, last line first, without reading them all in.
+
+        Rows with quoted line breaks are not supported; St George doesn't write them.
+        """
+        with open(self.filename, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size <= self.data_start:
+                return
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = size
+                while end > self.data_start:
+                    newline = mm.rfind(b'\n', self.data_start, end)
+                    start = newline + 1 if newline >= 0 else self.data_start
+                    yield mm[start:end].rstrip(b'\r').decode(self.fileobj.encoding)
+                    end = max(newline, self.data_start)
+
     def _parsed(self, row):
         """Break down the description to it's stg components and stick them and the end.
         @param row: a list of csv fields
+        @return: a tuple of the fields, then the transaction type, effective date, time and location.
         """
-        date, description, credit, debit, balance, *categories = row
-
-        transaction_type = description[:30]
+        description = row[1]
+        transaction_type = description[:self.FIRST_COL].strip()
 
         # leave direct transactions alone
-        if transaction_type.strip() not in self.DESCRIPTION_TYPES:
-            return row + [''] * 4
+        if transaction_type not in self.DESCRIPTION_TYPES:
+            return (*row, *self.NO_COMPONENTS)
 
-        effective_date = description[30:35]
-
-        time_candidate = description[35:]
-        if not re.match(self.TIME_REGEX, time_candidate):
+        if self.TIME_REGEX.match(description, self.SECOND_COL) is None:
             # no time
-            effective_time = ''
-            merchant = description[36:56].strip()
-            location = description[57:]
-        else:
-            # has time
-            effective_time = description[35:40]
-            merchant = " ".join(description[41:].split())
-            location = ''
-
-        return [
-            date,
-            merchant,
-            credit,
-            debit,
-            balance,
-            transaction_type.strip(),
-            effective_date,
-            effective_time,
-            location
-        ]
+            return (row[0], description[36:56].strip(), row[2], row[3], row[4],
+                    transaction_type, description[30:35], '', description[57:])
+        # has time
+        return (row[0], " ".join(description[41:].split()), row[2], row[3], row[4],
+                transaction_type, description[30:35], description[35:40], '')
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(text):
+    """Return the date of a dd/mm/yyyy field; an export only has a few hundred of them."""
+    return datetime.datetime.strptime(text, "%d/%m/%Y").date()
+
+
+@functools.lru_cache(maxsize=4096)
+def beancount_date(text):
+    """Return the yyyy-mm-dd, and the month, of a dd/mm/yyyy field."""
+    effective_date = parse_date(text)
+    return effective_date.strftime('%Y-%m-%d'), effective_date.month
+
+
+# Entries gathered before each write of write_beancount().
+WRITE_CHUNK = 4096
 
 
 def balance_entry(effective_date_str, bank_account, balance):
@@ -114,27 +175,242 @@ def to_beancount(csv_file, yaml_file, bank_account):
     merchant_accounts = accounts.AccountFile(yaml_file)
     this_month, last_balance = None, None
     with StGeorgeFile(csv_file) as transactions:
-        for (str_date, merchant, debit, credit, balance, transaction, act_date, act_time, location,
-             *other) in transactions:
-            # Parse for the effective date
-            effective_date = datetime.datetime.strptime(str_date, "%d/%m/%Y")
-            effective_date_str = effective_date.strftime('%Y-%m-%d')
-
-            # Balance every month
-            if this_month != effective_date.month:
-                this_month = effective_date.month
-                yield balance_entry(effective_date_str, bank_account, last_balance)
-            last_balance = balance
-
-            description = ("%s %s %s %s %s" % (merchant, location, transaction, act_date, act_time)).strip()
-            result = "%s * \"%s\"\n" % (effective_date_str, description)
-            account = merchant_accounts.match(merchant) or "Expenses:TODO"
-            if len(debit):
-                result += "    %s\n" % bank_account
-                result += "    %-46s %10.2f AUD\n" % (account, float(debit))
-            else:
-                result += "    %-46s %10.2f AUD\n" % (bank_account, float(credit))
-                result += "    %s\n" % account
-            yield result + "\n"
-        else:
-            yield balance_entry(effective_date_str, bank_account, balance)
+        for records in batches(transactions, BATCH_SIZE):
+            matches = merchant_accounts.match_many(record[1] for record in records)
+            for (str_date, merchant, debit, credit, balance, transaction, act_date, act_time, location,
+                 *other), account in zip(records, matches):
+                # Parse for the effective date
+                effective_date = datetime.datetime.strptime(str_date, "%d/%m/%Y")
+                effective_date_str = effective_date.strftime('%Y-%m-%d')
+
+                # Balance every month
+                if this_month != effective_date.month:
+                    this_month = effective_date.month
+                    yield balance_entry(effective_date_str, bank_account, last_balance)
+                last_balance = balance
+
+                description = ("%s %s %s %s %s" % (merchant, location, transaction, act_date, act_time)).strip()
+                result = "%s * \"%s\"\n" % (effective_date_str, description)
+                account = account or "Expenses:TODO"
+                if len(debit):
+                    result += "    %s\n" % bank_account
+                    result += "    %-46s %10.2f AUD\n" % (account, float(debit))
+                else:
+                    result += "    %-46s %10.2f AUD\n" % (bank_account, float(credit))
+                    result += "    %s\n" % account
+                yield result + "\n"
+        # the closing balance
+        yield balance_entry(effective_date_str, bank_account, balance)
+
+
+def rendered_entries(csv_file, merchant_accounts, bank_account, fingerprints=False):
+    """Yield the entries of a csv file, oldest first, as beancount text.
+
+    :param merchant_accounts: <AccountFile> the account->merchant mappings.
+    :param fingerprints: <bool> work out the dedup.fingerprint() of each entry.
+    :returns: <generator> of (yyyy-mm-dd, month, debit, credit, balance, text, fingerprint or None) tuples.
+    """
+    # the entries with the bank account already filled in
+    bank = bank_account.replace('%', '%%')
+    padded_bank = ('%-46s' % bank_account).replace('%', '%%')
+    debit_template = '%s * "%s"\n    ' + bank + '\n    %-46s %10.2f AUD\n\n'
+    credit_template = '%s * "%s"\n    ' + padded_bank + ' %10.2f AUD\n    %s\n\n'
+
+    with StGeorgeFile(csv_file) as transactions:
+        for records in batches(transactions, BATCH_SIZE):
+            matches = merchant_accounts.match_many(record[1] for record in records)
+            for (str_date, merchant, debit, credit, balance, transaction, act_date, act_time, location,
+                 *other), account in zip(records, matches):
+                date_str, month = beancount_date(str_date)
+                description = ("%s %s %s %s %s" % (merchant, location, transaction, act_date, act_time)).strip()
+                account = account or "Expenses:TODO"
+                if len(debit):
+                    text = debit_template % (date_str, description, account, float(debit))
+                else:
+                    text = credit_template % (date_str, description, float(credit), account)
+                key = None
+                if fingerprints:
+                    key = fingerprint(bank_account, date_str, Decimal(credit or 0) - Decimal(debit or 0), description)
+                yield date_str, month, debit, credit, balance, text, key
+
+
+def write_beancount(csv_file, yaml_file, bank_account, out, chunk_size=WRITE_CHUNK, ledger=None):
+    """Write the beancount records of to_beancount() to a file, a chunk of entries at a time.
+
+    :param csv_file: <string> the filename of the csv transaction data.
+    :param yaml_file: <string> the filename of the yaml account->merchant mappings.
+    :param bank_account: <string> the bank account which the transactions apply to.
+    :param out: <string or file> the filename to write to, or a text stream.
+    :param chunk_size: <int> the entries to gather before each write.
+    :param ledger: <string> the filename of the ledger, to leave out the transactions
+        already in it; or None.
+    :returns: <int> the number of transactions written.
+    """
+    if isinstance(out, str):
+        with open(out, 'w') as fh:
+            return write_beancount(csv_file, yaml_file, bank_account, fh, chunk_size, ledger)
+
+    balance_template = '%s balance ' + bank_account.replace('%', '%%') + '      %s AUD\n\n'
+    merchant_accounts = accounts.AccountFile(yaml_file)
+    index = None if ledger is None else DuplicateIndex.for_ledger(ledger)
+    claimed = collections.Counter()
+    this_month, last_balance, date_str = None, None, None
+    chunk, count = [], 0
+    for date_str, month, debit, credit, balance, text, key in rendered_entries(
+            csv_file, merchant_accounts, bank_account, index is not None):
+        # Balance every month
+        if this_month != month:
+            this_month = month
+            chunk.append(balance_template % (date_str, last_balance))
+        last_balance = balance
+        if index is not None and index.is_duplicate(None, key, claimed):
+            continue
+        chunk.append(text)
+        count += 1
+        if len(chunk) >= chunk_size:
+            out.write(''.join(chunk))
+            chunk.clear()
+
+    # the closing balance
+    if date_str is not None:
+        chunk.append(balance_template % (date_str, last_balance))
+    out.write(''.join(chunk))
+    return count
+
+
+def read_mapping(filename):
+    """Read a yaml of csv filename (or glob) -> bank account; relative to the yaml.
+
+    :raises ValueError: if a file is mapped to two accounts, or a pattern matches no files.
+    :returns: <list> of (csv filename, bank account) pairs, sorted by filename.
+    """
+    with open(filename) as fh:
+        mapping = yaml.load(fh, Loader=accounts.SafeLoader) or dict()
+    base = os.path.dirname(filename)
+    csv_accounts = dict()
+    for pattern, bank_account in mapping.items():
+        csv_files = glob.glob(os.path.join(base, os.path.expanduser(pattern)))
+        if not csv_files:
+            # most likely a typo, which would silently leave out the account
+            raise ValueError(f"{pattern} (for {bank_account}) matches no files")
+        for csv_file in csv_files:
+            if csv_accounts.setdefault(csv_file, bank_account) != bank_account:
+                raise ValueError(f"{csv_file} is mapped to {csv_accounts[csv_file]} and {bank_account}")
+    return sorted(csv_accounts.items())
+
+
+def convert_file(csv_file, yaml_file, bank_account):
+    """Return the entries of a csv file, oldest first; in a worker process of import_files().
+
+    :returns: <list> of (yyyy-mm-dd, balance before, balance after, text, fingerprint) tuples.
+    """
+    merchant_accounts = accounts.AccountFile(yaml_file)
+    return [
+        (date_str, str(Decimal(balance) + Decimal(debit or 0) - Decimal(credit or 0)), balance, text, key)
+        for date_str, month, debit, credit, balance, text, key in rendered_entries(
+            csv_file, merchant_accounts, bank_account, fingerprints=True)
+    ]
+
+
+def merge_entries(results, index=None):
+    """Yield the entries of many files in date order, with the balance of each account at the
+    start of each month, and the day after its last transaction.
+
+    A row found in more than one export of an account is only yielded once.
+
+    :param results: <list> of (bank account, entries of convert_file()) pairs; entries of
+        the same date keep the order of the list.
+    :param index: <DuplicateIndex> of the ledger, to leave out the transactions already
+        in it; or None.
+    :returns: <generator> of (text, True for a transaction or False for a balance) pairs.
+    """
+    last = dict()
+    for bank_account, entries in results:
+        if entries:
+            # the later file wins a tie, as it does in the merge
+            last[bank_account] = max(entries[-1], last.get(bank_account, entries[-1]), key=lambda e: e[0])
+    closing = collections.deque(sorted(
+        ((datetime.date.fromisoformat(date_str) + datetime.timedelta(days=1)).isoformat(), bank_account, after)
+        for bank_account, (date_str, before, after, text, key) in last.items()
+    ))
+
+    streams = [
+        zip(entries, itertools.repeat(bank_account), itertools.repeat(source))
+        for source, (bank_account, entries) in enumerate(results)
+    ]
+    months, sources, claimed = dict(), dict(), collections.Counter()
+    for (date_str, before, after, text, key), bank_account, source in heapq.merge(*streams, key=lambda e: e[0][0]):
+        while closing and closing[0][0] <= date_str:
+            yield balance_entry(*closing.popleft()), False
+        # the running balance tells the same row in overlapping exports from a repeat
+        if sources.setdefault((key, after), source) != source:
+            continue
+        # Balance every month
+        if months.get(bank_account) != date_str[:7]:
+            months[bank_account] = date_str[:7]
+            yield balance_entry(date_str, bank_account, before), False
+        if index is not None and index.is_duplicate(None, key, claimed):
+            continue
+        yield text, True
+    while closing:
+        yield balance_entry(*closing.popleft()), False
+
+
+def import_files(csv_accounts, yaml_file, out, workers=None, ledger=None):
+    """Convert many csv files at once, and write their entries to one beancount stream.
+
+    :param csv_accounts: <list> of (csv filename, bank account) pairs.
+    :param yaml_file: <string> the filename of the yaml account->merchant mappings.
+    :param out: <file> a text stream to write to.
+    :param workers: <int> processes to convert the files in; None for one per cpu.
+    :param ledger: <string> the filename of the ledger, to leave out the transactions
+        already in it; or None.
+    :returns: <int> the number of transactions written.
+    """
+    csv_files = [csv_file for csv_file, bank_account in csv_accounts]
+    bank_accounts = [bank_account for csv_file, bank_account in csv_accounts]
+    if workers == 1:
+        converted = map(convert_file, csv_files, itertools.repeat(yaml_file), bank_accounts)
+        results = list(zip(bank_accounts, converted))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            converted = executor.map(convert_file, csv_files, itertools.repeat(yaml_file), bank_accounts)
+            results = list(zip(bank_accounts, converted))
+
+    index = None if ledger is None else DuplicateIndex.for_ledger(ledger)
+    chunk, count = [], 0
+    for text, is_transaction in merge_entries(results, index):
+        chunk.append(text)
+        count += is_transaction
+        if len(chunk) >= WRITE_CHUNK:
+            out.write(''.join(chunk))
+            chunk.clear()
+    out.write(''.join(chunk))
+    return count
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.argument("mapping", type=click.Path(exists=True))
+@click.argument("yaml_file", metavar="ACCOUNTS", type=click.Path(exists=True))
+@click.option("--output", "-o", default="-", type=click.Path(), help="The beancount file to write; - for stdout.")
+@click.option("--workers", type=int, default=None, help="Processes to convert the files in; one per cpu by default.")
+@click.option("--ledger", type=click.Path(exists=True), help="Leave out the transactions already in this ledger.")
+def batch(mapping, yaml_file, output, workers, ledger):
+    """Convert the csv files of a MAPPING yaml (filename or glob -> bank account) into one beancount file.
+    """
+    try:
+        csv_accounts = read_mapping(mapping)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    with click.open_file(output, 'w') as out:
+        count = import_files(csv_accounts, yaml_file, out, workers, ledger)
+    click.echo(f"{count} transactions", err=True)
+
+
+if __name__ == "__main__":
+    cli()
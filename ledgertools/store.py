@@ -0,0 +1,185 @@
+"""A local copy of the Up Bank transactions, in SQLite.
+
+Settled transactions never change, so after the first download `sync` only asks
+Up for the transactions since the last sync, less an overlap to catch HELD
+transactions which have since settled (or gone away).
+"""
+import datetime
+import json
+import os
+import sqlite3
+
+from .upclient import HELD
+
+STORE_FILE = os.path.join(
+    os.getenv('LEDGERTOOLS_DATA', os.path.join(os.path.expanduser('~'), '.local', 'share', 'ledgertools')),
+    'upbank.sqlite',
+)
+
+# How far before the last sync to fetch again; HELD transactions settle within days.
+OVERLAP = datetime.timedelta(days=14)
+
+# Transactions written to the database at a time.
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    category TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_created_at ON transactions (created_at);
+CREATE INDEX IF NOT EXISTS transactions_status ON transactions (status);
+CREATE INDEX IF NOT EXISTS transactions_category ON transactions (category);
+CREATE TABLE IF NOT EXISTS sync (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def utc(moment: datetime.datetime) -> str:
+    """Return a tzaware datetime as a fixed width UTC string, which sorts in time order."""
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def parse_utc(text: str) -> datetime.datetime:
+    return datetime.datetime.strptime(text, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=datetime.timezone.utc)
+
+
+class TransactionStore:
+    """Up Bank transactions kept in a SQLite database, keyed by their id."""
+
+    def __init__(self, filename: str = STORE_FILE):
+        """
+        filename: str: the SQLite database; created if need be.
+        """
+        self.filename = filename
+        if filename != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_state(self, key):
+        row = self.connection.execute("SELECT value FROM sync WHERE key = ?", (key,)).fetchone()
+        return None if row is None else parse_utc(row[0])
+
+    def _set_state(self, key, moment):
+        self.connection.execute("INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)", (key, utc(moment)))
+
+    @property
+    def synced_since(self):
+        """The earliest time the store holds every transaction from; or None."""
+        return self._get_state('since')
+
+    @property
+    def synced_until(self):
+        """The time of the last sync; the store holds every transaction before it."""
+        return self._get_state('until')
+
+    def covers(self, since: datetime.datetime, until: datetime.datetime = None) -> bool:
+        """True if every transaction in [since, until) is in the store, as Up has it now.
+
+        A transaction HELD at the last sync may have settled, or gone, since; so a
+        range with one in it isn't covered.
+        """
+        synced_since, synced_until = self.synced_since, self.synced_until
+        if synced_since is None or synced_until is None:
+            return False
+        if not (synced_since <= since and until is not None and until <= synced_until):
+            return False
+        held = self.connection.execute(
+            "SELECT 1 FROM transactions WHERE status = ? AND created_at >= ? AND created_at < ? LIMIT 1",
+            (HELD, utc(since), utc(until)),
+        ).fetchone()
+        return held is None
+
+    def save(self, transactions) -> int:
+        """Insert, or update, the transactions.
+
+        Returns:
+            the number of transactions saved.
+        """
+        count = 0
+        batch = []
+        for transaction in transactions:
+            attributes = transaction['attributes']
+            category = (transaction.get('relationships', {}).get('category') or {}).get('data') or {}
+            batch.append((
+                transaction['id'],
+                utc(datetime.datetime.fromisoformat(attributes['createdAt'])),
+                attributes['status'],
+                category.get('id'),
+                json.dumps(transaction),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                count += self._save_batch(batch)
+        count += self._save_batch(batch)
+        return count
+
+    def _save_batch(self, batch):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO transactions (id, created_at, status, category, data) VALUES (?, ?, ?, ?, ?)",
+            batch,
+        )
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def sync(self, client, since: datetime.datetime = None, overlap: datetime.timedelta = OVERLAP, **kwargs) -> int:
+        """Fetch the transactions since the last sync (less the overlap) from Up.
+
+        Args:
+            client: an UpbankClient.
+            since: tzaware datetime to start from; needed for the first sync, or to
+                reach back before it.
+            overlap: how far before the last sync to fetch again.
+            kwargs: passed to client.iter_transactions(); eg: workers.
+
+        Returns:
+            the number of transactions fetched.
+        """
+        synced_since, synced_until = self.synced_since, self.synced_until
+        if since is None or (synced_since is not None and synced_since <= since):
+            if synced_until is None:
+                raise ValueError("The store is empty; give a date to sync from.")
+            since = max(synced_until - overlap, synced_since)
+        until = datetime.datetime.now(datetime.timezone.utc)
+
+        with self.connection:
+            # held transactions may have been cancelled; those still held come back
+            self.connection.execute(
+                "DELETE FROM transactions WHERE status = ? AND created_at >= ?", (HELD, utc(since))
+            )
+            count = self.save(client.iter_transactions(since, until, None, **kwargs))
+            self._set_state('since', min(since, synced_since or since))
+            self._set_state('until', until)
+        return count
+
+    def transactions(self, since: datetime.datetime, until: datetime.datetime = None, status: str = None) -> list:
+        """Return the stored transactions, newest first, as Up would.
+
+        Args:
+            see UpbankClient.transactions()
+        """
+        query = "SELECT data FROM transactions WHERE created_at >= ?"
+        params = [utc(since)]
+        if until is not None:
+            query += " AND created_at < ?"
+            params.append(utc(until))
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC, id"
+        return [json.loads(data) for data, in self.connection.execute(query, params)]
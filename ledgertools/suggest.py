@@ -0,0 +1,79 @@
+"""Suggest accounts for unknown transactions from the ones already in the ledger.
+
+An inverted index maps the words, and the three letter pieces of words, in past
+narrations to the accounts they were posted to.  The first posting of each of our
+transactions is the bank account, so the accounts learnt are the other postings.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+
+from . import beanfile
+from .ledger_index import LedgerIndex
+
+WORD_REGEX = re.compile(r'[a-z0-9]+')
+
+
+def ngrams(text):
+    """Return the set of words and letter trigrams in the text."""
+    result = set()
+    for word in WORD_REGEX.findall(text.lower()):
+        result.add(f"w:{word}")
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class Suggester(LedgerIndex):
+    """An inverted index of narration n-grams to accounts."""
+
+    def __init__(self):
+        super().__init__()
+        # n-gram -> {account: count}
+        self.grams = dict()
+        # n-gram -> number of transactions with it
+        self.frequency = Counter()
+        self.transactions = 0
+
+    def learn(self, narration, accounts):
+        """Add a transaction's narration, and the accounts it was posted to, to the index."""
+        accounts = [account for account in accounts if account not in beanfile.UNKNOWN_ACCOUNTS]
+        if not accounts:
+            return
+        self.transactions += 1
+        for gram in ngrams(narration):
+            self.frequency[gram] += 1
+            counts = self.grams.setdefault(gram, Counter())
+            for account in accounts:
+                counts[account] += 1
+
+    def learn_entries(self, entries):
+        for entry in entries:
+            self.learn(entry.narration, [posting.account for posting in entry.postings[1:]])
+
+    def suggest(self, narration, k=3, exclude=()):
+        """Return up to k of the most likely (account, score) for the narration.
+
+        Scores are between 0 and 1; rarer n-grams count for more.
+        """
+        scores = Counter()
+        total = 0.0
+        for gram in ngrams(narration):
+            # n-grams never seen before count as the rarest of all
+            frequency = self.frequency.get(gram, 0)
+            weight = math.log((1 + self.transactions) / max(frequency, 1))
+            total += weight
+            if not frequency:
+                continue
+            for account, count in self.grams[gram].items():
+                scores[account] += weight * count / frequency
+        if not scores:
+            return []
+        candidates = ((account, score / total) for account, score in scores.items() if account not in exclude)
+        return heapq.nlargest(k, candidates, key=lambda item: item[1])
+
+    def suggest_entry(self, entry, k=3):
+        """Return the suggestions for a beanfile.Entry, leaving out the accounts it already has."""
+        return self.suggest(entry.narration, k, exclude={posting.account for posting in entry.postings})
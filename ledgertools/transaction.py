@@ -0,0 +1,44 @@
+"""One shape for a bank transaction, whichever bank it came from.
+
+StGeorgeFile.transactions() and from_upbank() produce them, so the stages after
+reading a download needn't know its format.
+"""
+import datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+
+class Transaction(NamedTuple):
+    date: datetime.date
+    # negative for money out of the account
+    amount: Decimal
+    merchant: str
+    # the description as the bank wrote it
+    raw_text: Optional[str]
+    category: str
+    # the bank's id for the transaction; St George doesn't have one
+    source_id: Optional[str]
+
+
+def up_category(trans: dict) -> str:
+    """Return the "parent:category" of an Up transaction, or '' if it has none."""
+    try:
+        return ':'.join([
+            trans['relationships']['parentCategory']['data']['id'],
+            trans['relationships']['category']['data']['id'],
+        ])
+    except (KeyError, TypeError):
+        return ''
+
+
+def from_upbank(trans: dict) -> Transaction:
+    """Return the Transaction of a transaction from the Up API."""
+    attributes = trans['attributes']
+    return Transaction(
+        date=datetime.date.fromisoformat(attributes['createdAt'][:10]),
+        amount=Decimal(attributes['amount']['value']),
+        merchant=attributes['description'],
+        raw_text=attributes['rawText'],
+        category=up_category(trans),
+        source_id=trans['id'],
+    )
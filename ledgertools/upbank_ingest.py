@@ -1,6 +1,8 @@
-import json
-
-from datetime import date
+import functools
+import os
+import re
+import zlib
+from collections import Counter
 
 import beancount
 from beancount.core import data
@@ -8,11 +10,51 @@ from beancount.core import flags
 from beancount.core import (account, amount, number)
 from beancount.ingest import importer
 
+from .accounts import AccountFile
+from .dedup import SOURCE_ID, DuplicateIndex, fingerprint
+from .transaction import from_upbank
+from .upfile import UpFile
+from .util import BATCH_SIZE, batches
+
 # Upbank only operates in AUD, afaik.
 CURRENCY = "AUD"
 UP_ACCOUNT_NAME = "Assets:Bank:Upbank"
 TAG = "#fiona"
 
+# Bytes read from the start of a file to identify it.
+SNIFF_SIZE = 8192
+
+# An Up transaction; its type, then its rawText.
+SNIFF_REGEX = re.compile(rb'^\s*[\[{].*?"type"\s*:\s*"transactions".*?"rawText"\s*:', re.DOTALL)
+
+# files whose verdict is remembered
+SNIFF_CACHE_SIZE = 1024
+
+
+def sniff(filename):
+    """True if the file looks like a download of Up transactions, from its first few KB.
+
+    The verdicts are kept by the file's path, size and mtime, so a file seen before
+    isn't read again.
+    """
+    try:
+        stat = os.stat(filename)
+        return _sniff(os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=SNIFF_CACHE_SIZE)
+def _sniff(filename, size, mtime_ns):
+    with open(filename, 'rb') as fh:
+        head = fh.read(SNIFF_SIZE)
+    if head[:2] == b'\x1f\x8b':
+        try:
+            head = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(head, SNIFF_SIZE)
+        except zlib.error:
+            head = b''
+    return SNIFF_REGEX.match(head) is not None
+
 
 class UpbankImporter(importer.ImporterProtocol):
     """Interface that all source importers need to comply with.
@@ -22,15 +64,31 @@ class UpbankImporter(importer.ImporterProtocol):
     # you prefer to create your imported transactions with a different flag.
     FLAG = beancount.core.flags.FLAG_OKAY
 
-    def __init__(self, account_name=UP_ACCOUNT_NAME, tags=TAG):
+    def __init__(self, account_name=UP_ACCOUNT_NAME, tags=TAG, accounts=None, ledger=None):
         """
 
         Args:
             account_name: beancount account name for the upbank account.
                 eg:  "Assets:Bank:Upbank"
+            accounts: an AccountFile, or the filename of an accounts yaml, used to
+                add the other posting to each transaction; or None to leave it out.
+            ledger: the filename of the ledger, to mark the transactions already in it
+                as duplicates; or None.  It is read once, for every file extracted.
         """
         self.account_name = account_name
         self.tags = tags
+        if isinstance(accounts, str):
+            accounts = AccountFile(accounts)
+        self.accounts = accounts
+        self.ledger = ledger
+        self._index = None
+
+    @property
+    def duplicate_index(self):
+        """The DuplicateIndex of the ledger, brought up to date on first use; or None."""
+        if self._index is None and self.ledger is not None:
+            self._index = DuplicateIndex.for_ledger(self.ledger)
+        return self._index
 
     def name(self):
         """Return a unique id/name for this importer.
@@ -50,8 +108,7 @@ class UpbankImporter(importer.ImporterProtocol):
         Returns:
           A boolean, true if this importer can handle this file.
         """
-        # TODO: open file and import json and ensure it has the critical features.
-        return True
+        return sniff(file.name)
 
     def extract(self, file, existing_entries=None):
         """Extract transactions from a file.
@@ -66,34 +123,9 @@ class UpbankImporter(importer.ImporterProtocol):
           A list of new, imported directives (usually mostly Transactions)
           extracted from the file.
         """
-        # Open the file as json
-        transactions = json.loads(file.contents())
-        entries = []
-
-        for trans in reversed(transactions):
-            trans_id = trans['id']   # Could be used to flag "__duplicate__"s.
-            date_ = date.fromisoformat(trans['attributes']['createdAt'][:10])
-            raw_text = trans['attributes']['rawText']
-            narration = trans['attributes']['description']
-            value = amount.Amount(
-                beancount.core.number.D(trans['attributes']['amount']['value']),
-                CURRENCY
-            )
-            posting = data.Posting(self.account_name, value, None, None, None, None)
-            txn = data.Transaction(
-                meta=data.new_metadata(file.name, trans_id),
-                date=date_,
-                flag=beancount.core.flags.FLAG_OKAY,
-                payee=raw_text,
-                tags=data.EMPTY_SET,
-                links=data.EMPTY_SET,
-                narration=narration,
-                postings=[posting],
-            )
-            entries.append(txn)
+        return list(self.iter_extract(file))
 
         # TODO: insert balance line.
-        return entries
 
         #     try:
         #         category = ':'.join([
@@ -114,6 +146,48 @@ class UpbankImporter(importer.ImporterProtocol):
         # balance_str = f"{date_str} balance {accountname:36s} {balance:.2f} AUD"
         # click.echo(balance_str)
 
+    def iter_extract(self, file):
+        """Yield the transactions of a file oldest first, reading a batch at a time.
+
+        Args:
+          file: A cache.FileMemo instance.
+        """
+        index = self.duplicate_index
+        claimed = Counter()
+        with UpFile(file.name) as transactions:
+            for batch in batches(map(from_upbank, transactions), BATCH_SIZE):
+                if self.accounts is not None:
+                    matches = self.accounts.match_many((trans.merchant, trans.raw_text) for trans in batch)
+                else:
+                    matches = [None] * len(batch)
+                for trans, other_account in zip(batch, matches):
+                    duplicate = index is not None and index.is_duplicate(
+                        trans.source_id,
+                        fingerprint(self.account_name, trans.date, trans.amount, f"{trans.raw_text} {trans.merchant}"),
+                        claimed,
+                    )
+                    yield self._transaction(file, trans, other_account, duplicate)
+
+    def _transaction(self, file, trans, other_account, duplicate):
+        value = amount.Amount(trans.amount, CURRENCY)
+        postings = [data.Posting(self.account_name, value, None, None, None, None)]
+        if other_account is not None:
+            postings.append(data.Posting(other_account, None, None, None, None, None))
+        meta = data.new_metadata(file.name, trans.source_id, {SOURCE_ID: trans.source_id})
+        if duplicate:
+            # bean-extract comments these out
+            meta['__duplicate__'] = True
+        return data.Transaction(
+            meta=meta,
+            date=trans.date,
+            flag=beancount.core.flags.FLAG_OKAY,
+            payee=trans.raw_text,
+            tags=data.EMPTY_SET,
+            links=data.EMPTY_SET,
+            narration=trans.merchant,
+            postings=postings,
+        )
+
     def file_account(self, file):
         """Return an account associated with the given file.
 
@@ -8,7 +8,16 @@ That is really all I am interested in because I use my own pattern matching,
 against the transaction description, to sort them into accounts (aka categories).
 """
 import datetime
+import hashlib
+import itertools
+import time
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .scheduler import SCHEDULER, BULK, INTERACTIVE
 
 
 URL = "https://api.up.com.au/api/v1"
@@ -16,10 +25,34 @@ URL = "https://api.up.com.au/api/v1"
 # Maximum number of transactions upbank return per 'page'.
 PAGE_SIZE = 100
 
+# Connections kept open to Up, for reuse between requests.
+POOL_SIZE = 10
+
+# Retry server errors, waiting BACKOFF * 2 ** retry seconds, or as long as the
+# Retry-After header asks.  Rate limited (429) requests are retried as often,
+# once the scheduler has slowed down.
+RETRIES = 5
+BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Seconds to wait for a connection, and then for a response.
+TIMEOUT = (5, 30)
+
+# Seconds to keep the responses of the slow changing endpoints, when given a cache.
+CACHE_TTLS = {
+    "/categories": 7 * 24 * 60 * 60,
+    "/accounts": 60,
+}
+
 # Constants
 HELD = "HELD"
 SETTLED = "SETTLED"
 
+# Sizes of date window to split a range of transactions into, for fetching in parallel.
+MONTH = "month"
+WEEK = "week"
+WINDOWS = (MONTH, WEEK)
+
 
 class LocalTZ(datetime.tzinfo):
     """Your time zone with an arbitrary, constant offset."""
@@ -28,32 +61,118 @@ class LocalTZ(datetime.tzinfo):
         return datetime.timedelta(hours=+11, minutes=0)
 
 
+def month_range(year: int, month: int) -> tuple:
+    """Return the first moments of the month, and of the next month, in local time."""
+    local_tz = datetime.datetime.utcnow().astimezone().tzinfo
+    since = datetime.datetime(year=year, month=month, day=1, tzinfo=local_tz)
+    if month == 12:
+        month = 0
+        year += 1
+    until = datetime.datetime(year=year, month=month + 1, day=1, tzinfo=local_tz)
+    return since, until
+
+
+def date_windows(since: datetime.datetime, until: datetime.datetime, window: str = MONTH) -> list:
+    """Split [since, until) into consecutive [start, end) windows.
+
+    Month windows end on the first of each month, week windows every seven days.
+    """
+    result = []
+    start = since
+    while start < until:
+        if window == MONTH:
+            end = start.replace(
+                year=start.year + start.month // 12, month=start.month % 12 + 1, day=1,
+                hour=0, minute=0, second=0, microsecond=0,
+            )
+        else:
+            end = start + datetime.timedelta(weeks=1)
+        end = min(end, until)
+        result.append((start, end))
+        start = end
+    return result
+
+
+class ScheduledRetry(Retry):
+    """Retry server errors, but leave rate limited (429) responses to the scheduler."""
+    RETRY_AFTER_STATUS_CODES = Retry.RETRY_AFTER_STATUS_CODES - {429}
+
+
 class UpbankClient:
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        url: str = URL,
+        pool_size: int = POOL_SIZE,
+        retries: int = RETRIES,
+        backoff: float = BACKOFF,
+        timeout=TIMEOUT,
+        cache=None,
+        cache_ttls: dict = None,
+        scheduler=SCHEDULER,
+    ):
         """
         token: str: upbank "personal access token" from https://api.up.com.au/getting_started
+        url: str: the base of the Up API.
+        pool_size: int: number of keep-alive connections to hold open.
+        retries: int: times to retry a request after a 429 or 5xx response.
+        backoff: float: seconds to wait before the first retry, doubling each time.
+        timeout: seconds to wait for a response; or a (connect, read) tuple.
+        cache: a response_cache.ResponseCache for the slow changing endpoints; or None.
+        cache_ttls: dict: seconds to keep each endpoint's response; defaults to CACHE_TTLS.
+        scheduler: a scheduler.RequestScheduler to pace the requests; shared by default.
         """
         self.token = token
+        self.url = url
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_ttls = CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.scheduler = scheduler
+        self.retries = retries
+        self.session = self._session(pool_size, retries, backoff)
 
-    def get_month(self, year: int, month: int) -> []:
+    def _session(self, pool_size, retries, backoff) -> requests.Session:
+        # without a scheduler to slow down, retry 429s here too
+        retry_class = Retry if self.scheduler is None else ScheduledRetry
+        retry = retry_class(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES + ((429,) if self.scheduler is None else ()),
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self._headers())
+        return session
+
+    def get_month(self, year: int, month: int, workers: int = 1, window: str = MONTH) -> []:
         """Get settled transactions for the given month.
 
         year: int: year to download eg: 2021
         month: int: month to download eg: 3
+        workers, window: see transactions()
 
         Returns:
               A list of settled transactions as a dict.
         """
-        local_tz = datetime.datetime.utcnow().astimezone().tzinfo
-        since = datetime.datetime(year=year, month=month, day=1, tzinfo=local_tz)
-        if month == 12:
-            month = 0
-            year += 1
-        until = datetime.datetime(year=year, month=month + 1, day=1, tzinfo=local_tz)
-        return self.transactions(since, until, SETTLED)
+        return list(self.iter_month(year, month, workers, window))
+
+    def iter_month(self, year: int, month: int, workers: int = 1, window: str = MONTH):
+        """Yield the settled transactions for the given month, as they arrive."""
+        since, until = month_range(year, month)
+        return self.iter_transactions(since, until, SETTLED, workers, window)
 
     def transactions(
-        self, since: datetime.datetime, until: datetime.date = None, status: str = None
+        self,
+        since: datetime.datetime,
+        until: datetime.date = None,
+        status: str = None,
+        workers: int = 1,
+        window: str = MONTH,
     ) -> list:
         """Fetch a list of transactions.
 
@@ -61,10 +180,30 @@ class UpbankClient:
             since: tzaware datetime to start from
             until: tzaware datetime to stop at; or None for all.
             status: "HELD" or "SETTLED"
+            workers: number of date windows to fetch at once; 1 to page through in turn.
+            window: MONTH or WEEK; the size of the date windows.
 
         Returns:
             list of "SETTLED" transactions in dict format.
         """
+        return list(self.iter_transactions(since, until, status, workers, window))
+
+    def iter_transactions(
+        self,
+        since: datetime.datetime,
+        until: datetime.date = None,
+        status: str = None,
+        workers: int = 1,
+        window: str = MONTH,
+    ):
+        """Yield transactions, newest first, a page at a time as they arrive.
+
+        Args:
+            see transactions()
+        """
+        if workers > 1:
+            return self._iter_parallel(since, until, status, workers, window)
+
         params = dict()
 
         # Upbank only return PAGE_SIZE transactions per request, so we need to
@@ -74,30 +213,101 @@ class UpbankClient:
             params.update({"filter[until]": until})
         if status is not None:
             params.update({"filter[status]": status})
-        response = self.get("/transactions", params=params)
-        return response
+        return self.iter_get("/transactions", params=params)
+
+    def _iter_parallel(self, since, until, status, workers, window):
+        """Fetch the date windows on a pool of threads, yielding them newest first.
 
-    def get(self, path, params: dict = None) -> list:
+        Only `workers` windows are fetched ahead of the one being yielded.
+        """
+        if until is None:
+            until = datetime.datetime.now(since.tzinfo)
+        spans = iter(reversed(date_windows(since, until, window)))
+        seen = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque(
+                pool.submit(self.transactions, start, end, status)
+                for start, end in itertools.islice(spans, workers)
+            )
+            while pending:
+                page = pending.popleft().result()
+                for start, end in itertools.islice(spans, 1):
+                    pending.append(pool.submit(self.transactions, start, end, status))
+                for transaction in page:
+                    if transaction["id"] not in seen:
+                        seen.add(transaction["id"])
+                        yield transaction
+
+    def get(self, path, params: dict = None, priority: int = BULK) -> list:
         """Send a GET request to Up.
 
         Args:
             path: includes the preceding slash.
             params: request parameters.
+            priority: scheduler.INTERACTIVE to go ahead of BULK requests.
 
         Returns:
             list of data; probably dicts.
         """
-        result = []
-        uri = f"{URL}{path}"
+        ttl = self.cache_ttls.get(path)
+        if self.cache is None or ttl is None or params:
+            return list(self.iter_get(path, params, priority))
+
+        key = self._cache_key(path)
+        result = self.cache.get(key)
+        if result is None:
+            result = list(self.iter_get(path, params, priority))
+            self.cache.set(key, result, ttl)
+        return result
+
+    def invalidate(self, path: str = None):
+        """Forget the cached response for the path; or for every path."""
+        if self.cache is None:
+            return
+        if path is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(self._cache_key(path))
+
+    def _cache_key(self, path):
+        # each token sees its own accounts
+        return hashlib.sha256(f"{self.token} {self.url}{path}".encode()).hexdigest()
+
+    def iter_get(self, path, params: dict = None, priority: int = BULK):
+        """Send GET requests to Up, following the pages, yielding the data of each page.
+
+        Args:
+            see get()
+        """
+        uri = f"{self.url}{path}"
         while uri is not None:
-            response = requests.get(uri, headers=self._headers(), params=params)
+            response = self.send(uri, params, priority)
+            response.raise_for_status()
             data = response.json()
-            result.extend(data["data"])
+            yield from data["data"]
+            # the next link carries the params along
+            params = None
             try:
                 uri = data["links"]["next"]
             except KeyError:
                 break
-        return result
+
+    def send(self, uri, params: dict = None, priority: int = BULK) -> requests.Response:
+        """Send a GET request when the scheduler allows; again if it was rate limited.
+
+        Returns:
+            requests.Response
+        """
+        for attempt in range(self.retries + 1):
+            waited = self.scheduler.acquire(priority) if self.scheduler is not None else 0.0
+            start = time.monotonic()
+            response = self.session.get(uri, params=params, timeout=self.timeout)
+            if self.scheduler is not None:
+                self.scheduler.update(response)
+                self.scheduler.metrics.record(uri, response.status_code, time.monotonic() - start, waited)
+            if response.status_code != 429 or self.scheduler is None:
+                break
+        return response
 
     def ping(self):
         """Verify the access token is working.
@@ -105,15 +315,15 @@ class UpbankClient:
         Returns:
             requests.Response
         """
-        return requests.get(f"{URL}/util/ping", headers=self._headers())
+        return self.send(f"{self.url}/util/ping", priority=INTERACTIVE)
 
     def accounts(self):
         """Fetch a list of accounts."""
-        return self.get("/accounts")
+        return self.get("/accounts", priority=INTERACTIVE)
 
     def categories(self):
         """Fetch a list of categories."""
-        return self.get("/categories")
+        return self.get("/categories", priority=INTERACTIVE)
 
     def _headers(self):
         return {"Authorization": f"Bearer {self.token}"}
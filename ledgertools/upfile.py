@@ -0,0 +1,129 @@
+"""Read a download of Up transactions one at a time, without loading the file.
+
+A download is a json array of transactions (as `upbank month` writes), or one per
+line (`upbank month --ndjson`), perhaps gzipped; newest first, as Up lists them.
+The lines of an ndjson file are read from the end back.  The array is scanned
+once for where each transaction starts and ends, then read back to front.
+"""
+import array
+import codecs
+import gzip
+import json
+import mmap
+import re
+import shutil
+import tempfile
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# bytes of an array decoded at a time, while looking for where each item is
+WINDOW = 1 << 20
+
+SEPARATOR_REGEX = re.compile(r'[\s,]*')
+WHITESPACE = b' \t\r\n'
+
+
+class UpFile:
+    """
+    Working with a download of Up transactions.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fileobj = None
+        self.mm = None
+
+    def __enter__(self):
+        """open the file, unzipped, and sniff whether it is an array or ndjson"""
+        self.fileobj = open(self.filename, 'rb')
+        if self.fileobj.read(2) == GZIP_MAGIC:
+            self.fileobj.seek(0)
+            spool = tempfile.TemporaryFile()
+            with gzip.GzipFile(fileobj=self.fileobj) as stream:
+                shutil.copyfileobj(stream, spool)
+            self.fileobj.close()
+            self.fileobj = spool
+        self.fileobj.seek(0, 2)
+        if self.fileobj.tell():
+            self.mm = mmap.mmap(self.fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        head = self.mm[:64].lstrip(WHITESPACE) if self.mm is not None else b''
+        self.is_array = head.startswith(b'[')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.mm is not None:
+            self.mm.close()
+        self.fileobj.close()
+
+    def __iter__(self):
+        """Yield the transactions oldest first; the reverse of the file."""
+        if self.is_array:
+            spans = self._array_spans()
+            for i in range(len(spans) - 2, -1, -2):
+                yield json.loads(self.mm[spans[i]:spans[i + 1]])
+        else:
+            for start, end in self._reversed_lines():
+                yield json.loads(self.mm[start:end])
+
+    def forward(self):
+        """Yield the transactions in the order of the file; newest first."""
+        if self.is_array:
+            spans = self._array_spans()
+            for i in range(0, len(spans), 2):
+                yield json.loads(self.mm[spans[i]:spans[i + 1]])
+        else:
+            if self.mm is None:
+                return
+            self.mm.seek(0)
+            for line in iter(self.mm.readline, b''):
+                if line.strip():
+                    yield json.loads(line)
+
+    def _array_spans(self):
+        """Return the start and end offsets of each item of the array, one after the other."""
+        decoder = json.JSONDecoder()
+        spans = array.array('Q')
+        size = len(self.mm)
+        position = self.mm.find(b'[') + 1
+        window = WINDOW
+        while True:
+            chunk = self.mm[position:position + window]
+            complete = position + len(chunk) >= size
+            # leaves off a character cut in two by the window
+            text = codecs.getincrementaldecoder('utf-8')().decode(chunk, final=complete)
+            ascii = chunk.isascii()
+            # the end of the last item, in characters and bytes
+            i, offset = 0, position
+            while True:
+                j = SEPARATOR_REGEX.match(text, i).end()
+                if j == len(text) and not complete:
+                    break
+                if j == len(text) or text[j] == ']':
+                    return spans
+                try:
+                    end = decoder.raw_decode(text, j)[1]
+                except json.JSONDecodeError:
+                    if complete:
+                        raise
+                    break
+                start = offset + (j - i if ascii else len(text[i:j].encode()))
+                offset = start + (end - j if ascii else len(text[j:end].encode()))
+                spans.append(start)
+                spans.append(offset)
+                i = end
+            if offset == position:
+                # an item bigger than the window
+                window *= 2
+            position = offset
+
+    def _reversed_lines(self):
+        """Yield the start and end of each line with something on it, last line first."""
+        if self.mm is None:
+            return
+        end = len(self.mm)
+        while end > 0:
+            newline = self.mm.rfind(b'\n', 0, end)
+            start = newline + 1
+            if self.mm[start:end].strip():
+                yield start, end
+            end = max(newline, 0)
@@ -0,0 +1,16 @@
+"""Helpers and settings shared by the modules, whichever bank they work with."""
+import itertools
+import os
+
+# where the parsed and compiled account files, and the Up responses, are kept between runs
+CACHE_DIR = os.getenv('LEDGERTOOLS_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ledgertools'))
+
+# Transactions matched to accounts at a time.
+BATCH_SIZE = 1000
+
+
+def batches(iterable, size):
+    """Yield lists of up to size items from the iterable."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import unittest
+
+from ledgertools import upclient
+from ledgertools.async_upclient import AsyncUpbankClient
+from ledgertools.scheduler import RequestScheduler
+from stub_server import StubServer, make_transactions
+
+
+SINCE = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+UNTIL = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+ACCOUNTS = [{"type": "accounts", "id": name} for name in ("spending", "saver", "joint")]
+
+
+def unthrottled():
+    """A scheduler which won't slow down the local server."""
+    return RequestScheduler(rate=1000, burst=1000, max_rate=1000)
+
+
+def account_transactions():
+    result = dict()
+    for number, account in enumerate(ACCOUNTS):
+        transactions = make_transactions(250, hours=8 + number)
+        for transaction in transactions:
+            transaction["id"] = f"{account['id']}-{transaction['id']}"
+        result[account["id"]] = transactions
+    return result
+
+
+class TestAsyncUpbankClient(unittest.TestCase):
+    """Talk to a local stand-in for the Up API, many requests at once."""
+
+    def test_same_as_blocking(self):
+        with StubServer(make_transactions(500), categories=[{"id": "groceries"}]) as stub:
+            client = AsyncUpbankClient("token", url=stub.url, scheduler=unthrottled())
+            blocking = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            self.assertEqual(blocking.transactions(SINCE), asyncio.run(client.transactions(SINCE)))
+            self.assertEqual(
+                blocking.transactions(SINCE, UNTIL),
+                asyncio.run(client.transactions(SINCE, UNTIL, window=upclient.WEEK)),
+            )
+            self.assertEqual([{"id": "groceries"}], asyncio.run(client.categories()))
+            self.assertEqual(200, asyncio.run(client.ping()).status_code)
+
+    def test_account_transactions(self):
+        transactions = account_transactions()
+        with StubServer(accounts=ACCOUNTS, account_transactions=transactions) as stub:
+            stub.delay = 0.01
+            client = AsyncUpbankClient("token", url=stub.url, concurrency=4, scheduler=unthrottled())
+            result = asyncio.run(client.account_transactions(SINCE, UNTIL, window=upclient.MONTH))
+            self.assertEqual(transactions, result)
+            self.assertLessEqual(stub.max_in_flight, 4)
+            self.assertGreater(stub.max_in_flight, 1)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ledgertools import accounts, beanfile
+
+UNKNOWN_TESTFILE = 'tests/test_data/unknown.beancount'
+
+
+def read_all(filename):
+    """The unknown postings, found by reading every transaction."""
+    with open(filename, 'rb') as fh:
+        content = fh.read()
+    return [
+        (entry.offset, entry.date, entry.narration, posting.account, posting.offset)
+        for entry in beanfile.read_entries(content)
+        for posting in entry.postings
+        if posting.account in beanfile.UNKNOWN_ACCOUNTS
+    ]
+
+
+class TestScanUnknowns(unittest.TestCase):
+    """Jump between the unknown postings of a beancount file."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write(self, content):
+        filename = os.path.join(self.tempdir.name, 'main.beancount')
+        with open(filename, 'w') as fh:
+            fh.write(content)
+        return filename
+
+    def test_testfile(self):
+        unknowns = list(beanfile.scan_unknowns(UNKNOWN_TESTFILE))
+        self.assertEqual(7, len(unknowns))
+        self.assertEqual(read_all(UNKNOWN_TESTFILE), [unknown[:5] for unknown in unknowns])
+        self.assertEqual('5.00', unknowns[0].amount)
+        with open(UNKNOWN_TESTFILE, 'rb') as fh:
+            content = fh.read()
+        for unknown in unknowns:
+            self.assertTrue(content[unknown.account_offset:].startswith(b'ACCOUNT_UNKNOWN'))
+
+    def test_edge_cases(self):
+        filename = self._write(
+            ';2021-07-01 * "commented out"\n'
+            ';    ACCOUNT_UNKNOWN     5.00 AUD\n'
+            '\n'
+            '2021-07-02 * "Refund to Expenses:TODO"\n'
+            '    Assets:Bank:Joint                              12.50 AUD\n'
+            '    Expenses:TODO\n'
+            '\n'
+            '2021-07-03 * "Split ☕"\n'
+            '    Assets:Bank:Joint\n'
+            '    ACCOUNT_UNKNOWN [home:groceries]                3.00 AUD\n'
+            '    Expenses:TODO                                   4.00 AUD'
+        )
+        unknowns = list(beanfile.scan_unknowns(filename))
+        self.assertEqual(read_all(filename), [unknown[:5] for unknown in unknowns])
+        self.assertEqual(
+            [('Expenses:TODO', '-12.50'), ('ACCOUNT_UNKNOWN', '3.00'), ('Expenses:TODO', '4.00')],
+            [(unknown.account, unknown.amount) for unknown in unknowns])
+
+    def test_empty(self):
+        self.assertEqual([], list(beanfile.scan_unknowns(self._write(''))))
+
+    def test_cli(self):
+        result = CliRunner().invoke(accounts.cli, ['unknowns', '--json', UNKNOWN_TESTFILE])
+        self.assertEqual(0, result.exit_code)
+        rows = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual(7, len(rows))
+        self.assertTrue(result.stderr.startswith('# sha256 '))
+        self.assertEqual('CLARK RUBBER BROOKV1,BROOKVALE [Clark Rubber]', rows[0]['narration'])
+
+
+class TestResolveUnknowns(unittest.TestCase):
+    """Give unknown postings their accounts, in place."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, 'main.beancount')
+        with open(UNKNOWN_TESTFILE, 'rb') as fh:
+            self.content = fh.read()
+        with open(self.filename, 'wb') as fh:
+            fh.write(self.content)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _read(self):
+        with open(self.filename, 'rb') as fh:
+            return fh.read()
+
+    def test_resolve(self):
+        unknowns = list(beanfile.scan_unknowns(self.filename))
+        edits = [(unknowns[0].account_offset, 'Expenses:Home'), (unknowns[1].account_offset, 'Expenses:Food:Groceries:Aldi')]
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(2, beanfile.resolve_unknowns(self.filename, reversed(edits), sha256))
+
+        lines = self._read().decode().splitlines()
+        self.assertIn('    Expenses:Home                                        5.00 AUD', lines)
+        self.assertIn('    Expenses:Food:Groceries:Aldi                        39.43 AUD', lines)
+        remaining = list(beanfile.scan_unknowns(self.filename))
+        self.assertEqual([unknown[1:4] for unknown in unknowns[2:]], [unknown[1:4] for unknown in remaining])
+        self.assertEqual(len(self.content.splitlines()), len(lines))
+
+    def test_no_amount(self):
+        with open(self.filename, 'w') as fh:
+            fh.write('2021-07-02 * "Refund"\n    Assets:Bank:Joint    12.50 AUD\n    Expenses:TODO   \n')
+        unknown, = beanfile.scan_unknowns(self.filename)
+        beanfile.resolve_unknowns(self.filename, [(unknown.account_offset, 'Income:Refunds')])
+        self.assertEqual(b'2021-07-02 * "Refund"\n    Assets:Bank:Joint    12.50 AUD\n    Income:Refunds\n', self._read())
+
+    def test_comment(self):
+        with open(self.filename, 'w') as fh:
+            fh.write('2021-07-02 * "Lunch"\n    Assets:Bank:Joint    -12.50 AUD\n    Expenses:TODO ; hi\n')
+        unknown, = beanfile.scan_unknowns(self.filename)
+        beanfile.resolve_unknowns(self.filename, [(unknown.account_offset, 'Expenses:Food:Lunch')])
+        self.assertEqual(b'2021-07-02 * "Lunch"\n    Assets:Bank:Joint    -12.50 AUD\n    Expenses:Food:Lunch  ; hi\n',
+                         self._read())
+
+    def test_narration(self):
+        content = b'2021-07-02 * "Refund ACCOUNT_UNKNOWN thing"\n    Assets:Bank:Joint    12.50 AUD\n    Income:Refunds\n'
+        with open(self.filename, 'wb') as fh:
+            fh.write(content)
+        with self.assertRaises(ValueError):
+            beanfile.resolve_unknowns(self.filename, [(content.index(b'ACCOUNT_UNKNOWN'), 'Expenses:Car')])
+        self.assertEqual(content, self._read())
+
+    def test_verify(self):
+        unknown = next(beanfile.scan_unknowns(self.filename))
+        for edits, sha256 in [
+            ([(unknown.account_offset, 'Expenses:Home')], hashlib.sha256(b'other').hexdigest()),
+            ([(unknown.account_offset + 1, 'Expenses:Home')], None),
+            ([(unknown.offset, 'Expenses:Home')], None),
+            ([(unknown.account_offset, 'Expenses:Home'), (unknown.account_offset, 'Expenses:Food')], None),
+        ]:
+            with self.assertRaises(ValueError):
+                beanfile.resolve_unknowns(self.filename, edits, sha256)
+        self.assertEqual(self.content, self._read())
+        self.assertEqual(['main.beancount'], os.listdir(self.tempdir.name))
+
+    def test_cli(self):
+        header, *listed = CliRunner().invoke(accounts.cli, ['unknowns', self.filename]).output.splitlines()
+        self.assertEqual(f"# sha256 {hashlib.sha256(self.content).hexdigest()}", header)
+        edits = header + '\n' + ''.join(f"{line.split()[0]} Expenses:Shopping\n" for line in listed)
+        result = CliRunner().invoke(accounts.cli, ['resolve', self.filename, '-'], input=edits)
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertEqual('7 postings resolved.\n', result.output)
+        self.assertEqual([], list(beanfile.scan_unknowns(self.filename)))
+
+        result = CliRunner().invoke(accounts.cli, ['resolve', self.filename, '-'], input='12 Expenses:Shopping\n')
+        self.assertEqual(2, result.exit_code)
+
+        # the file has changed since the offsets were listed
+        result = CliRunner().invoke(accounts.cli, ['resolve', self.filename, '-'], input=edits)
+        self.assertEqual(2, result.exit_code)
+        self.assertIn('has changed', result.output)
@@ -0,0 +1,11 @@
+"""Keep the caches and data the tests write out of the user's home directory."""
+import atexit
+import os
+import shutil
+import tempfile
+
+# before ledgertools is imported; its default directories are read from these
+HOME = tempfile.mkdtemp(prefix='ledgertools-tests-')
+atexit.register(shutil.rmtree, HOME, ignore_errors=True)
+os.environ['LEDGERTOOLS_CACHE'] = os.path.join(HOME, 'cache')
+os.environ['LEDGERTOOLS_DATA'] = os.path.join(HOME, 'data')
@@ -0,0 +1,127 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from beancount.ingest import cache
+from beancount.parser import printer
+
+from ledgertools import dedup, stgeorge, upbank_ingest
+from ledgertools.beanfile import read_entries
+
+CSV_TESTFILE = 'tests/test_data/stgeorge.csv'
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+RAW_FILE = os.path.abspath('tests/test_data/up_transactions.json')
+
+BANK_ACCOUNT = 'Assets:Bank:CompleteFreedom'
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    """Leave out the transactions already in the ledger."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.tempdir.name, 'main.beancount')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write_ledger(self, text, mode='w'):
+        with open(self.ledger, mode) as fh:
+            fh.write(text)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            dedup.fingerprint('Assets:Bank', '2021-02-01', '-1,000.5', 'TYPO, NORTH SYDNEY [Typo]'),
+            dedup.fingerprint('Assets:Bank', '2021-02-01', -1000.50, 'Typo North Sydney typo'))
+        self.assertNotEqual(
+            dedup.fingerprint('Assets:Bank', '2021-02-01', '10.00', 'Typo'),
+            dedup.fingerprint('Assets:Bank', '2021-02-01', '-10.00', 'Typo'))
+
+    def test_entry_keys(self):
+        text = (
+            b'2021-07-02 * "OPEN DOORS [Open Doors]"  #fiona\n'
+            b'    source_id: "txn-1"\n'
+            b'    Assets:Bank:Fiona-Upbank\n'
+            b'    Expenses:Tithe                        150.00 AUD\n\n'
+        )
+        entry, = read_entries(text)
+        self.assertEqual(
+            ('txn-1', dedup.fingerprint('Assets:Bank:Fiona-Upbank', '2021-07-02', '-150', 'open doors open doors')),
+            dedup.entry_keys(entry))
+
+    def test_incremental(self):
+        content = ''.join(stgeorge.to_beancount(CSV_TESTFILE, YAML_TESTFILE, BANK_ACCOUNT))
+        head, tail = content[:len(content) // 2], content[len(content) // 2:]
+        head, tail = head[:head.rindex('\n\n') + 2], head[head.rindex('\n\n') + 2:] + tail
+        self._write_ledger(head)
+
+        index = dedup.DuplicateIndex.for_ledger(self.ledger)
+        count = sum(index.fingerprints.values())
+        self.assertTrue(os.path.exists(dedup.index_filename(self.ledger)))
+        self.assertEqual(0, dedup.DuplicateIndex.for_ledger(self.ledger).learn_file(self.ledger))
+
+        self._write_ledger(tail, 'a')
+        index = dedup.DuplicateIndex.load(dedup.index_filename(self.ledger))
+        self.assertEqual(len(tail.encode()), index.learn_file(self.ledger))
+        self.assertEqual(6, sum(index.fingerprints.values()))
+        self.assertLess(count, 6)
+
+        # an edit reads the ledger again
+        self._write_ledger(tail)
+        self.assertEqual(len(tail.encode()), index.learn_file(self.ledger))
+        self.assertEqual(6 - count, sum(index.fingerprints.values()))
+
+    def test_write_beancount(self):
+        content = ''.join(stgeorge.to_beancount(CSV_TESTFILE, YAML_TESTFILE, BANK_ACCOUNT))
+        self._write_ledger(content)
+        out = io.StringIO()
+        self.assertEqual(0, stgeorge.write_beancount(CSV_TESTFILE, YAML_TESTFILE, BANK_ACCOUNT, out, ledger=self.ledger))
+        self.assertNotIn(' * ', out.getvalue())
+
+        # the last three transactions are new
+        self._write_ledger(content[:content.index('2021-02-01 * ')])
+        out = io.StringIO()
+        self.assertEqual(3, stgeorge.write_beancount(CSV_TESTFILE, YAML_TESTFILE, BANK_ACCOUNT, out, ledger=self.ledger))
+        self.assertIn('2021-02-01 * ', out.getvalue())
+
+    def test_overlapping_exports(self):
+        with open(CSV_TESTFILE) as fh:
+            header, *rows = fh.readlines()
+        csv_accounts = []
+        for name, lines in [('a.csv', rows[:4]), ('b.csv', rows[2:])]:
+            filename = os.path.join(self.tempdir.name, name)
+            with open(filename, 'w') as fh:
+                fh.writelines([header] + lines)
+            csv_accounts.append((filename, BANK_ACCOUNT))
+        out = io.StringIO()
+        self.assertEqual(6, stgeorge.import_files(csv_accounts, YAML_TESTFILE, out, workers=1))
+
+        self._write_ledger(out.getvalue())
+        self.assertEqual(0, stgeorge.import_files(csv_accounts, YAML_TESTFILE, io.StringIO(), 1, self.ledger))
+
+    def test_upbank(self):
+        importer = upbank_ingest.UpbankImporter()
+        entries = importer.extract(cache.get_file(RAW_FILE))
+        # half imported with ids, and one the old way, without
+        self._write_ledger(printer.format_entry(entries[0]) + '\n')
+        legacy = entries[1]
+        self._write_ledger(
+            f'{legacy.date} * "{legacy.payee} [{legacy.narration}]"  #fiona\n'
+            f'    {upbank_ingest.UP_ACCOUNT_NAME}\n'
+            f'    ACCOUNT_UNKNOWN [home:groceries]    {-legacy.postings[0].units.number:.2f} AUD\n\n', 'a')
+
+        importer = upbank_ingest.UpbankImporter(ledger=self.ledger)
+        entries = importer.extract(cache.get_file(RAW_FILE))
+        duplicates = [entry.meta.get('__duplicate__', False) for entry in entries]
+        self.assertEqual([True, True] + [False] * (len(entries) - 2), duplicates)
+        self.assertEqual(entries[2].meta[dedup.SOURCE_ID], entries[2].meta['lineno'])
+
+    def test_upbank_index_once(self):
+        self._write_ledger('')
+        importer = upbank_ingest.UpbankImporter(ledger=self.ledger)
+        with mock.patch.object(dedup.DuplicateIndex, 'for_ledger', wraps=dedup.DuplicateIndex.for_ledger) as for_ledger:
+            for _ in range(3):
+                importer.extract(cache.get_file(RAW_FILE))
+        self.assertEqual(1, for_ledger.call_count)
@@ -0,0 +1,191 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from ledgertools import accounts as acc
+
+
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+
+DESCRIPTIONS = [
+    'Aldi 104',
+    'ALDI 104',
+    'Coles 929023912 asdf Nsa',
+    'Bunnings 2019',
+    'Kfc Urban Manly',
+    'A Touch Of Europe Ba',
+    'Mcdonalds Manly',
+    'Caltex Manly 2095',
+    '4 Pines Brewing',
+    'Credit Interest',
+    'Bobs bar',
+    '',
+]
+
+
+def scan(accounts, description):
+    """The original, uncompiled, ordered scan of the merchant patterns."""
+    for pattern in accounts.merchant_accounts.keys():
+        if re.match(pattern, description, re.IGNORECASE):
+            return accounts.merchant_accounts[pattern]
+    return None
+
+
+class TestMerchantMatcher(unittest.TestCase):
+    """The compiled matcher agrees with a plain scan of the patterns."""
+
+    def setUp(self):
+        self.accounts = acc.AccountFile(YAML_TESTFILE)
+
+    def test_same_as_scan(self):
+        for description in DESCRIPTIONS:
+            self.assertEqual(scan(self.accounts, description), self.accounts.match(description), description)
+
+    def test_first_match_wins(self):
+        # "KFC" (Eatout) is listed before "Kfc Urban Manly" (Eatin)
+        self.assertEqual("Expenses:Food:Eatout", self.accounts.match('Kfc Urban Manly'))
+
+    def test_none(self):
+        self.assertIsNone(self.accounts.match(None))
+        self.assertIsNone(self.accounts.match('Bobs bar'))
+
+
+class TestLiteralPrefix(unittest.TestCase):
+    """Extract the literal start of a merchant pattern."""
+
+    def test_literal_prefix(self):
+        self.assertEqual('aldi', acc.literal_prefix(r'Aldi\s.*'))
+        self.assertEqual('coles', acc.literal_prefix(r'Coles(\s.*)?'))
+        self.assertEqual('smp*manly', acc.literal_prefix(r'Smp\*Manly'))
+        self.assertEqual('hopstohome', acc.literal_prefix(r'Hopstohome.Com.Au'))
+        self.assertEqual('a', acc.literal_prefix(r'ab?c'))
+        self.assertEqual('penny lane caf', acc.literal_prefix('Penny Lane Café'))
+        self.assertEqual('220001804', acc.literal_prefix('220001804'))
+
+    def test_wildcards(self):
+        self.assertEqual('', acc.literal_prefix(r'.*Lily Wozniak'))
+        self.assertEqual('', acc.literal_prefix(r'Aldi|Coles'))
+        self.assertEqual('', acc.literal_prefix(r'x*'))
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """The prefix trie never changes the outcome of the ordered scan."""
+
+    def test_same_as_scan(self):
+        accounts = acc.AccountFile(YAML_TESTFILE)
+        descriptions = DESCRIPTIONS + [
+            pattern.replace('\\', '') for pattern in accounts.merchant_accounts.keys()
+        ] + ['Penny Lane Café', 'Something Lily Wozniak', 'Kfc Manly']
+        for description in descriptions:
+            self.assertEqual(scan(accounts, description), accounts.match(description), description)
+
+    def test_candidates(self):
+        matcher = acc.MerchantMatcher({'Aldi.*': 'A', '.*Lily': 'B', 'Coles': 'C', 'Al': 'D'})
+        self.assertEqual([0, 1, 3], list(matcher.candidates('ALDI 104')))
+        self.assertEqual([1], list(matcher.candidates('Bunnings')))
+        self.assertEqual('D', matcher.match('Alfies'))
+
+
+class TestMatchCache(unittest.TestCase):
+    """Remember recent matches."""
+
+    def test_hits_and_misses(self):
+        accounts = acc.AccountFile(YAML_TESTFILE)
+        for description in ['Aldi 104', 'Bobs bar', 'Aldi 104', 'Bobs bar', 'Aldi 104']:
+            accounts.match(description)
+        self.assertEqual(dict(hits=3, misses=2, evictions=0, size=2), accounts.cache.stats)
+        self.assertIsNone(accounts.match('Bobs bar'))
+
+    def test_eviction(self):
+        accounts = acc.AccountFile(YAML_TESTFILE, cache_size=2)
+        for description in ['Aldi 104', 'Coles', 'Aldi 104', 'Bunnings 2019', 'Coles']:
+            accounts.match(description)
+        self.assertEqual(dict(hits=1, misses=4, evictions=2, size=2), accounts.cache.stats)
+        self.assertEqual(['Bunnings 2019', 'Coles'], list(accounts.cache.entries))
+
+    def test_disabled(self):
+        accounts = acc.AccountFile(YAML_TESTFILE, cache_size=0)
+        accounts.match('Aldi 104')
+        self.assertEqual(0, len(accounts.cache.entries))
+
+    def test_reload(self):
+        accounts = acc.AccountFile(YAML_TESTFILE)
+        accounts.match('Aldi 104')
+        accounts.reload()
+        self.assertEqual(0, len(accounts.cache.entries))
+        self.assertEqual("Expenses:Food:Groceries", accounts.match('Aldi 104'))
+
+
+class TestCompiledCache(unittest.TestCase):
+    """Keep the parsed yaml between runs."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.yaml_file = os.path.join(self.tempdir.name, 'accounts.yaml')
+        shutil.copy(YAML_TESTFILE, self.yaml_file)
+        self.cache_dir = os.path.join(self.tempdir.name, 'cache')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_cached(self):
+        first = acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+        with unittest.mock.patch.object(acc.yaml, 'load') as load:
+            second = acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+            load.assert_not_called()
+        self.assertEqual(first.account_merchants, second.account_merchants)
+        self.assertEqual(list(first.merchant_accounts.items()), list(second.merchant_accounts.items()))
+        self.assertEqual("Expenses:Food:Groceries", second.match('Aldi 104'))
+
+    def test_touched(self):
+        acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        os.utime(self.yaml_file, ns=(0, 0))
+        with unittest.mock.patch.object(acc.yaml, 'load') as load:
+            acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+            load.assert_not_called()
+
+    def test_changed(self):
+        acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        with open(self.yaml_file, 'a') as fh:
+            fh.write("Bobs:\n  - Bobs bar\n")
+        accounts = acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        self.assertEqual("Bobs", accounts.match('Bobs bar'))
+
+    def test_disabled(self):
+        acc.AccountFile(self.yaml_file, cache_dir=None)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_stale(self):
+        first = acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        # pickled by code which has since been renamed
+        with open(first._cache_filename, 'wb') as fh:
+            fh.write(b'cledgertools.renamed\nMerchantMatcher\n(tR.')
+        accounts = acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+        self.assertEqual("Expenses:Food:Groceries", accounts.match('Aldi 104'))
+        # and cached again
+        acc.AccountFile(self.yaml_file, cache_dir=self.cache_dir)
+
+
+class TestMatchMany(unittest.TestCase):
+    """Match a whole file of descriptions at once."""
+
+    def test_match_many(self):
+        accounts = acc.AccountFile(YAML_TESTFILE, cache_size=0)
+        descriptions = ['Aldi 104', 'Bobs bar', 'Aldi 104', None, 'Bunnings 2019', 'Aldi 104']
+        self.assertEqual([accounts.match(d) for d in descriptions], accounts.match_many(descriptions))
+
+    def test_unique(self):
+        accounts = acc.AccountFile(YAML_TESTFILE)
+        accounts.match_many(['Aldi 104'] * 10 + ['Bobs bar'] * 10)
+        self.assertEqual(2, accounts.cache.misses + accounts.cache.hits)
+
+    def test_alternatives(self):
+        accounts = acc.AccountFile(YAML_TESTFILE)
+        self.assertEqual(
+            ["Expenses:Food:Groceries", "Expenses:Food:Eatout", None],
+            accounts.match_many([('Aldi 104', 'KFC'), ('Bobs bar', 'KFC'), ('Bobs bar', None)]),
+        )
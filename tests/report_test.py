@@ -0,0 +1,70 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+from click.testing import CliRunner
+
+from ledgertools import accounts, report
+
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+CSV_TESTFILE = 'tests/test_data/stgeorge.csv'
+UP_TESTFILE = 'tests/test_data/up_transactions.json'
+
+
+class TestUnknownMerchantReport(unittest.TestCase):
+    """Total the unknown merchants of many downloads."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        # the same Up transactions again, as ndjson
+        self.ndjson = os.path.join(self.tempdir.name, 'up.ndjson')
+        with open(UP_TESTFILE) as fh, open(self.ndjson, 'w') as out:
+            out.writelines(json.dumps(transaction) + '\n' for transaction in json.load(fh))
+        self.report = report.UnknownMerchantReport(accounts.AccountFile(YAML_TESTFILE))
+        for filename in [UP_TESTFILE, self.ndjson, CSV_TESTFILE]:
+            self.report.add_file(filename)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_totals(self):
+        self.assertEqual(46, self.report.transactions)
+        self.assertEqual(9, self.report.unknowns)
+        typo = self.report.merchants['Typo']
+        self.assertEqual(2, typo.count)
+        self.assertEqual(Decimal('-26.64'), typo.total)
+        self.assertEqual((datetime.date(2020, 12, 11),) * 2, (typo.first, typo.last))
+        self.assertEqual(1, self.report.merchants['Bobs bar'].count)
+
+    def test_top(self):
+        everyone = self.report.top()
+        self.assertEqual(len(self.report.merchants), len(everyone))
+        self.assertEqual(everyone[:3], self.report.top(3))
+        self.assertEqual(2, everyone[0].count)
+        self.assertEqual('JOHN MEE', self.report.top(1, by='total')[0].merchant)
+
+    def test_formats(self):
+        out = io.StringIO()
+        self.report.write(out, 2, fmt='json')
+        rows = json.loads(out.getvalue())
+        self.assertEqual([merchant.as_dict() for merchant in self.report.top(2)], rows)
+
+        out = io.StringIO()
+        self.report.write(out, 2, fmt='csv')
+        self.assertEqual(rows, [dict(row, count=int(row['count'])) for row in csv.DictReader(io.StringIO(out.getvalue()))])
+
+        out = io.StringIO()
+        self.report.write(out, 2)
+        lines = out.getvalue().splitlines()
+        self.assertEqual('9 of 46 transactions have no account.', lines[0])
+        self.assertEqual(3, len(lines))
+
+    def test_cli(self):
+        result = CliRunner().invoke(accounts.cli, ['report', YAML_TESTFILE, UP_TESTFILE, CSV_TESTFILE, '--top', '0', '--format', 'json'])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertEqual(5, len(json.loads(result.output)))
@@ -0,0 +1,106 @@
+import datetime
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from ledgertools import scheduler, upclient
+from stub_server import StubServer, make_transactions
+
+
+def response(status, **headers):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update({key.replace('_', '-'): value for key, value in headers.items()})
+    return result
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Hand out requests at a pace, by priority."""
+
+    def test_pace(self):
+        pacer = scheduler.RequestScheduler(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            pacer.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_priority(self):
+        pacer = scheduler.RequestScheduler(rate=100, burst=1)
+        pacer.acquire()
+        pacer.paused_until = time.monotonic() + 0.1
+        order = []
+
+        def request(name, priority):
+            pacer.acquire(priority)
+            order.append(name)
+
+        bulk = threading.Thread(target=request, args=('bulk', scheduler.BULK))
+        bulk.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=request, args=('ping', scheduler.INTERACTIVE))
+        interactive.start()
+        bulk.join()
+        interactive.join()
+        self.assertEqual(['ping', 'bulk'], order)
+
+    def test_interrupted(self):
+        pacer = scheduler.RequestScheduler(rate=100, burst=1)
+        pacer.acquire()
+        with mock.patch.object(pacer._condition, 'wait', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                pacer.acquire()
+        self.assertEqual([], pacer._waiting)
+        # the next in line isn't stuck behind it
+        waiter = threading.Thread(target=pacer.acquire)
+        waiter.start()
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+
+    def test_metrics_threads(self):
+        metrics = scheduler.RequestMetrics()
+
+        def record():
+            for _ in range(2000):
+                metrics.record('/transactions', 200, 0.001, 0.0)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(16000, metrics.stats['requests'])
+
+    def test_throttled(self):
+        pacer = scheduler.RequestScheduler(rate=10)
+        pacer.update(response(429, Retry_After='2'))
+        self.assertEqual(5, pacer.rate)
+        self.assertEqual(0, pacer.tokens)
+        self.assertGreater(pacer.paused_until, time.monotonic() + 1.5)
+        pacer.update(response(200))
+        self.assertGreater(pacer.rate, 5)
+
+    def test_rate_limit_headers(self):
+        pacer = scheduler.RequestScheduler(rate=10, burst=10)
+        pacer.update(response(200, X_RateLimit_Remaining='3'))
+        self.assertEqual(3, pacer.tokens)
+        pacer.update(response(200, X_RateLimit_Remaining='0', X_RateLimit_Reset='1'))
+        self.assertGreater(pacer.paused_until, time.monotonic() + 0.5)
+
+
+class TestScheduledClient(unittest.TestCase):
+    """The client slows down instead of failing."""
+
+    def test_no_failed_pages(self):
+        since = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+        pacer = scheduler.RequestScheduler(rate=1000, burst=1000, max_rate=1000)
+        with StubServer(make_transactions(300)) as stub:
+            stub.failures = [(429, {"Retry-After": "0"})] * 2
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=pacer)
+            self.assertEqual(stub.transactions, client.transactions(since))
+        stats = pacer.metrics.stats
+        self.assertEqual(5, stats['requests'])
+        self.assertEqual(2, stats['throttled'])
+        self.assertEqual(250, pacer.rate // 1)
@@ -0,0 +1,86 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ledgertools import stgeorge
+
+CSV_TESTFILE = 'tests/test_data/stgeorge.csv'
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+
+
+class TestBatchImport(unittest.TestCase):
+    """Convert many St George exports, of many accounts, into one beancount stream."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        with open(CSV_TESTFILE) as fh:
+            header, *rows = fh.readlines()
+        # one account's export, split into two monthly files, and another account
+        self._write('joint-2021-02.csv', [header] + rows[:3])
+        self._write('joint-2021-01.csv', [header] + rows[3:])
+        shutil.copy(CSV_TESTFILE, os.path.join(self.tempdir.name, 'saver.csv'))
+        self.mapping = self._write('mapping.yaml', [
+            "joint-*.csv: Assets:Bank:Joint\n",
+            "saver.csv: Assets:Bank:Saver\n",
+        ])
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write(self, name, lines):
+        filename = os.path.join(self.tempdir.name, name)
+        with open(filename, 'w') as fh:
+            fh.writelines(lines)
+        return filename
+
+    def _import(self, workers):
+        out = io.StringIO()
+        count = stgeorge.import_files(stgeorge.read_mapping(self.mapping), YAML_TESTFILE, out, workers)
+        return count, out.getvalue()
+
+    def test_read_mapping(self):
+        self.assertEqual([
+            (os.path.join(self.tempdir.name, 'joint-2021-01.csv'), 'Assets:Bank:Joint'),
+            (os.path.join(self.tempdir.name, 'joint-2021-02.csv'), 'Assets:Bank:Joint'),
+            (os.path.join(self.tempdir.name, 'saver.csv'), 'Assets:Bank:Saver'),
+        ], stgeorge.read_mapping(self.mapping))
+
+        mapping = self._write('conflict.yaml', ["joint-*.csv: Assets:Bank:Joint\n", "joint-2021-01.csv: Assets:Bank:Saver\n"])
+        with self.assertRaises(ValueError):
+            stgeorge.read_mapping(mapping)
+
+        mapping = self._write('typo.yaml', ["joint-*.csv: Assets:Bank:Joint\n", "savr.csv: Assets:Bank:Saver\n"])
+        with self.assertRaises(ValueError):
+            stgeorge.read_mapping(mapping)
+
+    def test_cli_typo(self):
+        mapping = self._write('typo.yaml', ["savr.csv: Assets:Bank:Saver\n"])
+        output = os.path.join(self.tempdir.name, 'out.beancount')
+        result = CliRunner().invoke(stgeorge.cli, ['batch', mapping, YAML_TESTFILE, '-o', output])
+        self.assertEqual(2, result.exit_code)
+        self.assertIn('savr.csv (for Assets:Bank:Saver) matches no files', result.output)
+        self.assertFalse(os.path.exists(output))
+
+    def test_import(self):
+        count, text = self._import(workers=1)
+        self.assertEqual(12, count)
+        dates = re.findall(r'^(\d{4}-\d\d-\d\d) ', text, re.MULTILINE)
+        self.assertEqual(sorted(dates), dates)
+
+        balances = re.findall(r'^(\S+) balance (\S+)\s+(\S+) AUD', text, re.MULTILINE)
+        self.assertEqual([
+            ('2021-01-14', 'Assets:Bank:Joint', '2142.25'),
+            ('2021-01-14', 'Assets:Bank:Saver', '2142.25'),
+            ('2021-02-01', 'Assets:Bank:Joint', '2033.50'),
+            ('2021-02-01', 'Assets:Bank:Saver', '2033.50'),
+            ('2021-02-04', 'Assets:Bank:Joint', '1954.90'),
+            ('2021-02-04', 'Assets:Bank:Saver', '1954.90'),
+        ], balances)
+
+    def test_workers(self):
+        self.assertEqual(self._import(workers=1), self._import(workers=2))
@@ -0,0 +1,89 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from ledgertools import stgeorge
+
+
+CSV_TESTFILE = 'tests/test_data/stgeorge.csv'
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+
+
+def read_all(filename):
+    """Every row parsed, oldest first, by reading the whole file in."""
+    with stgeorge.StGeorgeFile(filename) as thefile:
+        rows = [row for row in csv.reader(thefile.fileobj, thefile.dialect) if row]
+        return [thefile._parsed(row) for row in reversed(rows)]
+
+
+class TestStGeorgeReader(unittest.TestCase):
+    """Stream the rows of a St George csv in either direction."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write(self, content, newline=None):
+        filename = os.path.join(self.tempdir.name, 'trans.csv')
+        with open(filename, 'w', newline=newline) as fh:
+            fh.write(content)
+        return filename
+
+    def test_reversed(self):
+        with stgeorge.StGeorgeFile(CSV_TESTFILE) as thefile:
+            rows = list(thefile)
+        self.assertEqual(read_all(CSV_TESTFILE), rows)
+        self.assertEqual('14/01/2021', rows[0][0])
+        self.assertEqual(('03/02/2021', 'Bunnings 2019'), rows[-1][:2])
+
+    def test_forward(self):
+        with stgeorge.StGeorgeFile(CSV_TESTFILE) as thefile:
+            rows = list(thefile.forward())
+        self.assertEqual(list(reversed(read_all(CSV_TESTFILE))), rows)
+
+    def test_line_endings(self):
+        with open(CSV_TESTFILE) as fh:
+            content = fh.read()
+        for filename in [
+            self._write(content.replace('\n', '\r\n'), newline=''),
+            self._write(content.rstrip('\n')),
+            self._write(content + '\n\n'),
+        ]:
+            with stgeorge.StGeorgeFile(filename) as thefile:
+                self.assertEqual(read_all(CSV_TESTFILE), list(thefile))
+
+    def test_no_header(self):
+        with open(CSV_TESTFILE) as fh:
+            content = fh.read().split('\n', 1)[1]
+        filename = self._write(content)
+        with stgeorge.StGeorgeFile(filename) as thefile:
+            self.assertFalse(thefile.has_header)
+            self.assertEqual(read_all(CSV_TESTFILE), list(thefile))
+
+    def test_parsed(self):
+        with stgeorge.StGeorgeFile(CSV_TESTFILE) as thefile:
+            rows = list(thefile.forward())
+        self.assertEqual(
+            ('03/02/2021', 'Bunnings 2019', '45.10', '', '1954.90', 'Visa Purchase', '01Feb', '', 'Brookvale Au'),
+            rows[0])
+        self.assertEqual(
+            ('02/02/2021', 'Aldi 104 Manly', '23.50', '', '2000.00', 'Eftpos Purchase', '02Feb', '10:15', ''),
+            rows[1])
+        self.assertEqual(('31/01/2021', 'Credit Interest', '', '1.25', '2033.50', '', '', '', ''), rows[3])
+
+    def test_write_beancount(self):
+        expected = ''.join(stgeorge.to_beancount(CSV_TESTFILE, YAML_TESTFILE, 'Assets:Bank:CompleteFreedom'))
+        for chunk_size in [1, 3, stgeorge.WRITE_CHUNK]:
+            out = io.StringIO()
+            count = stgeorge.write_beancount(CSV_TESTFILE, YAML_TESTFILE, 'Assets:Bank:CompleteFreedom', out, chunk_size)
+            self.assertEqual(6, count)
+            self.assertEqual(expected, out.getvalue())
+
+        filename = os.path.join(self.tempdir.name, 'out.beancount')
+        stgeorge.write_beancount(CSV_TESTFILE, YAML_TESTFILE, 'Assets:Bank:100%', filename)
+        with open(filename) as fh:
+            self.assertEqual(''.join(stgeorge.to_beancount(CSV_TESTFILE, YAML_TESTFILE, 'Assets:Bank:100%')), fh.read())
@@ -0,0 +1,90 @@
+import datetime
+import unittest
+
+from ledgertools import store, upclient
+from ledgertools.scheduler import RequestScheduler
+from stub_server import StubServer, make_transactions
+
+
+SINCE = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) \
+    - datetime.timedelta(days=200)
+
+
+class TestTransactionStore(unittest.TestCase):
+    """Keep a local copy of the transactions."""
+
+    def setUp(self):
+        self.store = store.TransactionStore(':memory:')
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+        # every day, up to a week ago
+        days = (self.now - SINCE).days - 7
+        self.stub = StubServer(make_transactions(days, start=SINCE, hours=24))
+        self.stub.__enter__()
+        # not the shared scheduler, which other tests may have slowed down
+        self.client = upclient.UpbankClient("token", url=self.stub.url, scheduler=RequestScheduler())
+
+    def tearDown(self):
+        self.stub.__exit__(None, None, None)
+        self.store.close()
+
+    def test_first_sync(self):
+        with self.assertRaises(ValueError):
+            self.store.sync(self.client)
+        self.assertEqual(len(self.stub.transactions), self.store.sync(self.client, SINCE))
+        self.assertEqual(self.stub.transactions, self.store.transactions(SINCE))
+        self.assertTrue(self.store.covers(SINCE, self.now))
+        self.assertFalse(self.store.covers(SINCE - datetime.timedelta(days=1), self.now))
+        self.assertFalse(self.store.covers(SINCE, None))
+
+    def test_incremental_sync(self):
+        self.store.sync(self.client, SINCE)
+        held = make_transactions(2, start=self.now - datetime.timedelta(days=3), hours=1)
+        for transaction in held:
+            transaction['id'] = 'held-' + transaction['id']
+            transaction['attributes']['status'] = upclient.HELD
+        self.stub.transactions = held + self.stub.transactions
+        self.stub.requests.clear()
+
+        # only the overlap is fetched again
+        overlap = datetime.timedelta(days=14)
+        recent = self.client.transactions(self.store.synced_until - overlap)
+        self.stub.requests.clear()
+        self.assertEqual(len(recent), self.store.sync(self.client, overlap=overlap))
+        self.assertLess(len(recent), 20)
+        self.assertEqual(1, len(self.stub.requests))
+        self.assertEqual(2, len(self.store.transactions(SINCE, status=upclient.HELD)))
+
+        # one settles, the other is cancelled
+        self.stub.transactions = self.stub.transactions[1:]
+        self.stub.transactions[0]['attributes']['status'] = upclient.SETTLED
+        self.store.sync(self.client)
+        self.assertEqual([], self.store.transactions(SINCE, status=upclient.HELD))
+        self.assertEqual(self.stub.transactions, self.store.transactions(SINCE))
+
+    def test_covers_held(self):
+        held = make_transactions(1, start=self.now - datetime.timedelta(days=2))
+        held[0]['id'] = 'held-' + held[0]['id']
+        held[0]['attributes']['status'] = upclient.HELD
+        self.stub.transactions = held + self.stub.transactions
+        self.store.sync(self.client, SINCE)
+        until = self.store.synced_until
+
+        # it settles after the sync; the store doesn't know
+        held[0]['attributes']['status'] = upclient.SETTLED
+        settled = self.client.transactions(SINCE, until, upclient.SETTLED)
+        self.assertEqual(len(settled) - 1, len(self.store.transactions(SINCE, until, upclient.SETTLED)))
+        self.assertFalse(self.store.covers(SINCE, until))
+        # before it was made, the store is still good
+        self.assertTrue(self.store.covers(SINCE, self.now - datetime.timedelta(days=3)))
+
+        self.store.sync(self.client)
+        self.assertTrue(self.store.covers(SINCE, until))
+        self.assertEqual(settled, self.store.transactions(SINCE, until, upclient.SETTLED))
+
+    def test_transactions(self):
+        self.store.sync(self.client, SINCE)
+        until = (SINCE + datetime.timedelta(days=40)).astimezone(datetime.timezone(datetime.timedelta(hours=11)))
+        self.assertEqual(
+            self.client.transactions(SINCE, until, upclient.SETTLED),
+            self.store.transactions(SINCE, until, upclient.SETTLED),
+        )
@@ -0,0 +1,136 @@
+"""A local stand-in for the Up Bank API, for testing the clients without a token."""
+import datetime
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_transactions(count, start=datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc), hours=6):
+    """Return count transactions, newest first (as Up does), every few hours from start."""
+    result = []
+    for i in range(count):
+        created = start + datetime.timedelta(hours=hours * i)
+        result.append({
+            "type": "transactions",
+            "id": f"txn-{i:06d}",
+            "attributes": {
+                "status": "SETTLED",
+                "rawText": f"MERCHANT {i % 7}, MANLY",
+                "description": f"Merchant {i % 7}",
+                "amount": {"currencyCode": "AUD", "value": f"-{i % 50}.{i % 100:02d}", "valueInBaseUnits": 0},
+                "createdAt": created.isoformat(),
+            },
+            "relationships": {
+                "category": {"data": None},
+                "parentCategory": {"data": None},
+            },
+        })
+    return list(reversed(result))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path[len(stub.prefix):]
+        with stub.lock:
+            stub.requests.append((path, params))
+            stub.clients.add(self.client_address)
+            failure = stub.failures.pop(0) if stub.failures else None
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+        try:
+            time.sleep(stub.delay)
+            self._respond(stub, path, params, failure)
+        finally:
+            with stub.lock:
+                stub.in_flight -= 1
+
+    def _respond(self, stub, path, params, failure):
+        if failure is not None:
+            status, headers = failure
+            return self._send(status, {"errors": []}, headers)
+        if path == "/util/ping":
+            return self._send(200, {"meta": {"id": "ping", "statusEmoji": "⚡️"}})
+        if path == "/accounts":
+            return self._send(200, {"data": stub.accounts, "links": {"prev": None, "next": None}})
+        if path == "/categories":
+            return self._send(200, {"data": stub.categories})
+        if path == "/transactions" or path.startswith("/accounts/"):
+            return self._send(200, self._page(stub, path, params))
+        return self._send(404, {"errors": []})
+
+    def _page(self, stub, path, params):
+        transactions = stub.transactions
+        if path.startswith("/accounts/"):
+            account_id = path.split("/")[2]
+            transactions = stub.account_transactions.get(account_id, [])
+        if "filter[since]" in params:
+            since = datetime.datetime.fromisoformat(params["filter[since]"])
+            transactions = [t for t in transactions if datetime.datetime.fromisoformat(t["attributes"]["createdAt"]) >= since]
+        if "filter[until]" in params:
+            until = datetime.datetime.fromisoformat(params["filter[until]"])
+            transactions = [t for t in transactions if datetime.datetime.fromisoformat(t["attributes"]["createdAt"]) < until]
+        if "filter[status]" in params:
+            transactions = [t for t in transactions if t["attributes"]["status"] == params["filter[status]"]]
+        size = int(params.get("page[size]", 20))
+        after = int(params.get("page[after]", 0))
+        page = transactions[after:after + size]
+        next_link = None
+        if after + size < len(transactions):
+            query = dict(params, **{"page[after]": after + size})
+            next_link = f"{self.server.stub.url}{path}?{urllib.parse.urlencode(query)}"
+        return {"data": page, "links": {"prev": None, "next": next_link}}
+
+    def _send(self, status, body, headers=None):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubServer:
+    """Serve the Up API on localhost, in a thread.
+
+    Use as a context manager; `url` is the base to give the client.
+    """
+    prefix = "/api/v1"
+
+    def __init__(self, transactions=(), accounts=(), categories=(), account_transactions=None):
+        self.transactions = list(transactions)
+        self.accounts = list(accounts)
+        self.categories = list(categories)
+        self.account_transactions = account_transactions or dict()
+        # (status, headers) to answer with before behaving normally
+        self.failures = []
+        self.requests = []
+        self.clients = set()
+        # seconds to take over each response
+        self.delay = 0
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_port}{self.prefix}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ledgertools import accounts, beanfile
+from ledgertools.suggest import Suggester
+
+
+BEAN_TESTFILE = 'tests/test_data/unknown.beancount'
+
+HISTORY = """
+2021-06-01 * "ALDI STORES - MANLY,MANLY [ALDI]"
+    Assets:Bank:Fiona-Upbank
+    Expenses:Food:Groceries                             12.00 AUD
+
+2021-06-02 * "WOOLWORTHS 1234, MANLY [Woolworths]"
+    Assets:Bank:Fiona-Upbank
+    Expenses:Food:Groceries                             20.00 AUD
+
+2021-06-03 * "CLARK RUBBER MANLY,MANLY [Clark Rubber]"
+    Assets:Bank:Fiona-Upbank
+    Expenses:Household:Consumables                       8.00 AUD
+
+"""
+
+
+class TestReadEntries(unittest.TestCase):
+    """Read transactions, including the unknown ones beancount can't parse."""
+
+    def test_read_entries(self):
+        with open(BEAN_TESTFILE, 'rb') as fh:
+            content = fh.read()
+        entries = list(beanfile.read_entries(content))
+        self.assertEqual(9, len(entries))
+        self.assertEqual(7, len([entry for entry in entries if entry.is_unknown]))
+        entry = entries[2]
+        self.assertEqual('2021-07-03', entry.date)
+        self.assertEqual('CLARK RUBBER BROOKV1,BROOKVALE [Clark Rubber]', entry.narration)
+        self.assertEqual(['Assets:Bank:Fiona-Upbank', 'ACCOUNT_UNKNOWN'], [p.account for p in entry.postings])
+        self.assertEqual('5.00', entry.postings[1].amount)
+        self.assertTrue(content[entry.offset:].startswith(b'2021-07-03 * "CLARK'))
+        self.assertTrue(content[entry.postings[1].offset:].startswith(b'ACCOUNT_UNKNOWN'))
+
+
+class TestSuggester(unittest.TestCase):
+    """Suggest accounts from the history."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.tempdir.name, 'ledger.beancount')
+        with open(self.ledger, 'w') as fh:
+            fh.write(HISTORY)
+        self.suggester = Suggester()
+        self.suggester.learn_file(self.ledger)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_suggest(self):
+        self.assertEqual(3, self.suggester.transactions)
+        account, score = self.suggester.suggest('ALDI STORES - BALGOW,BALGOWLAH ALDI')[0]
+        self.assertEqual('Expenses:Food:Groceries', account)
+        self.assertGreater(score, 0.3)
+        account, score = self.suggester.suggest('CLARK RUBBER BROOKV1,BROOKVALE [Clark Rubber]')[0]
+        self.assertEqual('Expenses:Household:Consumables', account)
+        self.assertLess(score, self.suggester.suggest('CLARK RUBBER MANLY,MANLY [Clark Rubber]')[0][1])
+        self.assertEqual([], self.suggester.suggest('zzz'))
+
+    def test_suggest_entry(self):
+        with open(BEAN_TESTFILE, 'rb') as fh:
+            unknowns = [entry for entry in beanfile.read_entries(fh.read()) if entry.is_unknown]
+        suggestions = [self.suggester.suggest_entry(entry, 1) for entry in unknowns]
+        self.assertEqual('Expenses:Food:Groceries', suggestions[1][0][0])
+        self.assertEqual('Expenses:Food:Groceries', suggestions[2][0][0])
+
+    def test_incremental(self):
+        with open(self.ledger, 'a') as fh:
+            fh.write(HISTORY.replace('2021-06', '2021-07'))
+        self.assertEqual(len(HISTORY), self.suggester.learn_file(self.ledger))
+        self.assertEqual(6, self.suggester.transactions)
+        self.assertEqual(0, self.suggester.learn_file(self.ledger))
+
+    def test_changed(self):
+        with open(self.ledger, 'w') as fh:
+            fh.write(HISTORY.replace('Household:Consumables', 'Household:Hardware'))
+        self.suggester.learn_file(self.ledger)
+        self.assertEqual(3, self.suggester.transactions)
+        self.assertEqual('Expenses:Household:Hardware', self.suggester.suggest('Clark Rubber')[0][0])
+
+    def test_save_load(self):
+        index = os.path.join(self.tempdir.name, 'index', 'suggest.pickle')
+        self.suggester.save(index)
+        loaded = Suggester.load(index)
+        self.assertEqual(self.suggester.suggest('Woolworths'), loaded.suggest('Woolworths'))
+        self.assertEqual(0, loaded.learn_file(self.ledger))
+        self.assertEqual(0, Suggester.load(os.path.join(self.tempdir.name, 'missing')).transactions)
+        with open(index, 'wb') as fh:
+            fh.write(b'cledgertools.renamed\nSuggester\n(tR.')
+        self.assertEqual(0, Suggester.load(index).transactions)
+
+    def test_cli(self):
+        index = os.path.join(self.tempdir.name, 'suggest.pickle')
+        result = CliRunner().invoke(accounts.cli, ['suggest', '--index', index, '--top', '1', self.ledger, BEAN_TESTFILE])
+        self.assertEqual(0, result.exit_code, result.output)
+        lines = result.output.splitlines()
+        self.assertEqual(7, len([line for line in lines if not line.startswith(' ')]))
+        self.assertIn('2021-07-03 "CLARK RUBBER BROOKV1,BROOKVALE [Clark Rubber]"', lines)
+        self.assertTrue(os.path.exists(index))
@@ -0,0 +1,54 @@
+import datetime
+import json
+import unittest
+from decimal import Decimal
+
+from ledgertools import stgeorge
+from ledgertools.transaction import Transaction, from_upbank
+
+CSV_TESTFILE = 'tests/test_data/stgeorge.csv'
+UP_TESTFILE = 'tests/test_data/up_transactions.json'
+
+
+class TestTransaction(unittest.TestCase):
+    """Both banks' downloads as Transactions."""
+
+    def test_from_upbank(self):
+        with open(UP_TESTFILE) as fh:
+            raw = json.load(fh)
+        transactions = [from_upbank(item) for item in raw]
+        self.assertEqual(len(raw), len(transactions))
+        first = transactions[-1]
+        self.assertEqual(datetime.date(2020, 12, 11), first.date)
+        self.assertEqual(Decimal('-13.32'), first.amount)
+        self.assertEqual('Typo', first.merchant)
+        self.assertEqual('TYPO, NORTH SYDNEY', first.raw_text)
+        self.assertEqual('personal:life-admin', first.category)
+        self.assertEqual(raw[-1]['id'], first.source_id)
+
+    def test_from_upbank_no_category(self):
+        item = {
+            'id': 'txn-1',
+            'attributes': {
+                'createdAt': '2021-01-02T10:00:00+11:00',
+                'amount': {'value': '5.00'},
+                'description': 'Transfer',
+                'rawText': None,
+            },
+            'relationships': {'category': {'data': None}, 'parentCategory': {'data': None}},
+        }
+        self.assertEqual(
+            Transaction(datetime.date(2021, 1, 2), Decimal('5.00'), 'Transfer', None, '', 'txn-1'),
+            from_upbank(item))
+
+    def test_stgeorge(self):
+        with stgeorge.StGeorgeFile(CSV_TESTFILE) as thefile:
+            transactions = list(thefile.transactions())
+        self.assertEqual(6, len(transactions))
+        self.assertEqual(
+            Transaction(datetime.date(2021, 1, 14), Decimal('-50.00'), 'Increase 50 Per Month',
+                        'Increase 50 Per Month', '', None),
+            transactions[0])
+        self.assertEqual(Decimal('1.25'), transactions[2].amount)
+        self.assertEqual('Aldi 104 Manly', transactions[4].merchant)
+        self.assertTrue(transactions[4].raw_text.startswith('Eftpos Purchase'))
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from beancount.ingest import cache
+
+from ledgertools import upbank_ingest
+from ledgertools.accounts import AccountFile
+
+
+YAML_TESTFILE = 'tests/test_data/accounts.yaml'
+RAW_FILE = os.path.abspath('tests/test_data/up_transactions.json')
+
+
+class TestUpbankImporter(unittest.TestCase):
+    """Import a raw download of Up transactions."""
+
+    def test_extract(self):
+        importer = upbank_ingest.UpbankImporter()
+        entries = importer.extract(cache.get_file(RAW_FILE))
+        transactions = json.load(open(RAW_FILE))
+        self.assertEqual(len(transactions), len(entries))
+        self.assertEqual(transactions[-1]['attributes']['description'], entries[0].narration)
+        self.assertTrue(all(len(entry.postings) == 1 for entry in entries))
+
+    def test_extract_accounts(self):
+        importer = upbank_ingest.UpbankImporter(accounts=AccountFile(YAML_TESTFILE))
+        entries = importer.extract(cache.get_file(RAW_FILE))
+        kfc = [entry for entry in entries if entry.narration == 'KFC']
+        self.assertTrue(kfc)
+        for entry in kfc:
+            self.assertEqual("Expenses:Food:Eatout", entry.postings[1].account)
+
+    def test_identify(self):
+        upbank_ingest._sniff.cache_clear()
+        importer = upbank_ingest.UpbankImporter()
+        with tempfile.TemporaryDirectory() as tempdir:
+            with open(RAW_FILE) as fh:
+                transactions = json.load(fh)
+            ndjson = os.path.join(tempdir, 'up.ndjson.gz')
+            with gzip.open(ndjson, 'wt') as fh:
+                fh.writelines(json.dumps(transaction) + '\n' for transaction in transactions)
+            garbage = os.path.join(tempdir, 'statement.pdf')
+            with open(garbage, 'wb') as fh:
+                fh.write(b'\x1f\x8b%PDF' + bytes(range(256)))
+            empty = os.path.join(tempdir, 'empty.json')
+            open(empty, 'w').close()
+            copy = shutil.copy(RAW_FILE, os.path.join(tempdir, 'copy.json'))
+
+            for filename, expected in [
+                (RAW_FILE, True),
+                (ndjson, True),
+                (copy, True),
+                (os.path.abspath('tests/test_data/up_categories.json'), False),
+                (os.path.abspath('tests/test_data/stgeorge.csv'), False),
+                (garbage, False),
+                (empty, False),
+            ]:
+                self.assertEqual(expected, importer.identify(cache.get_file(filename)), filename)
+            self.assertEqual(7, upbank_ingest._sniff.cache_info().currsize)
+
+            # seen before, so not read again
+            with mock.patch('builtins.open', side_effect=AssertionError("read again")):
+                self.assertTrue(importer.identify(cache.get_file(copy)))
+            # changed, so read again
+            with open(copy, 'a') as fh:
+                fh.write(' ' * 10)
+            self.assertTrue(importer.identify(cache.get_file(copy)))
+            self.assertEqual(8, upbank_ingest._sniff.cache_info().currsize)
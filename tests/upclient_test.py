@@ -0,0 +1,139 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import requests
+
+from ledgertools import upclient
+from ledgertools.response_cache import FileResponseCache, ResponseCache
+from ledgertools.scheduler import RequestScheduler
+from stub_server import StubServer, make_transactions
+
+
+SINCE = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def unthrottled():
+    """A scheduler which won't slow down the local server."""
+    return RequestScheduler(rate=1000, burst=1000, max_rate=1000)
+
+
+class TestUpbankClient(unittest.TestCase):
+    """Talk to a local stand-in for the Up API."""
+
+    def test_pages(self):
+        with StubServer(make_transactions(250)) as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            transactions = client.transactions(SINCE)
+            self.assertEqual(stub.transactions, transactions)
+            self.assertEqual(3, len(stub.requests))
+            # one keep-alive connection for every page
+            self.assertEqual(1, len(stub.clients))
+
+    def test_retry(self):
+        with StubServer(make_transactions(150)) as stub:
+            stub.failures = [(503, {}), (429, {"Retry-After": "0"})]
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled(), backoff=0)
+            self.assertEqual(150, len(client.transactions(SINCE)))
+            self.assertEqual(4, len(stub.requests))
+
+    def test_retries_exhausted(self):
+        with StubServer(make_transactions(10)) as stub:
+            stub.failures = [(500, {})] * 3
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled(), retries=2, backoff=0)
+            with self.assertRaises(requests.HTTPError):
+                client.transactions(SINCE)
+
+    def test_ping(self):
+        with StubServer() as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            self.assertEqual(200, client.ping().status_code)
+
+
+class TestParallel(unittest.TestCase):
+    """Fetch date windows at once."""
+
+    def test_date_windows(self):
+        until = datetime.datetime(2021, 3, 10, tzinfo=datetime.timezone.utc)
+        windows = upclient.date_windows(SINCE.replace(day=15), until)
+        self.assertEqual([(15, 1), (1, 1), (1, 10)], [(start.day, end.day) for start, end in windows])
+        self.assertEqual(until, windows[-1][1])
+        weeks = upclient.date_windows(SINCE, until, upclient.WEEK)
+        self.assertEqual(10, len(weeks))
+        self.assertEqual(SINCE + datetime.timedelta(weeks=1), weeks[0][1])
+
+    def test_same_as_sequential(self):
+        until = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+        with StubServer(make_transactions(1000)) as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            sequential = client.transactions(SINCE, until)
+            for window in upclient.WINDOWS:
+                self.assertEqual(sequential, client.transactions(SINCE, until, workers=4, window=window))
+
+
+class TestStreaming(unittest.TestCase):
+    """Yield transactions as the pages arrive."""
+
+    def test_iter_transactions(self):
+        with StubServer(make_transactions(250)) as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            transactions = client.iter_transactions(SINCE)
+            self.assertEqual(stub.transactions[0], next(transactions))
+            self.assertEqual(1, len(stub.requests))
+            self.assertEqual(stub.transactions[1:], list(transactions))
+            self.assertEqual(3, len(stub.requests))
+
+    def test_iter_parallel(self):
+        until = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+        with StubServer(make_transactions(1000)) as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled())
+            transactions = client.iter_transactions(SINCE, until, workers=2)
+            self.assertEqual(stub.transactions[0], next(transactions))
+            self.assertEqual(stub.transactions[1:], list(transactions))
+
+
+class TestResponseCache(unittest.TestCase):
+    """Keep the categories and accounts for a while."""
+
+    categories = [{"type": "categories", "id": "groceries"}]
+
+    def test_cached(self):
+        with StubServer(categories=self.categories) as stub, tempfile.TemporaryDirectory() as directory:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled(), cache=FileResponseCache(directory))
+            self.assertEqual(self.categories, client.categories())
+            self.assertEqual(self.categories, client.categories())
+            self.assertEqual(1, len(stub.requests))
+
+            # another run, same cache
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled(), cache=FileResponseCache(directory))
+            self.assertEqual(self.categories, client.categories())
+            self.assertEqual(1, len(stub.requests))
+
+            # someone else's accounts
+            other = upclient.UpbankClient("other", url=stub.url, scheduler=unthrottled(), cache=FileResponseCache(directory))
+            other.categories()
+            self.assertEqual(2, len(stub.requests))
+
+            client.invalidate("/categories")
+            client.categories()
+            self.assertEqual(3, len(stub.requests))
+            client.invalidate()
+            self.assertEqual([], os.listdir(directory))
+
+    def test_expired(self):
+        with StubServer(categories=self.categories) as stub:
+            client = upclient.UpbankClient(
+                "token", url=stub.url, scheduler=unthrottled(), cache=ResponseCache(), cache_ttls={"/categories": 0}
+            )
+            client.categories()
+            client.categories()
+            self.assertEqual(2, len(stub.requests))
+
+    def test_not_cached(self):
+        with StubServer(make_transactions(10)) as stub:
+            client = upclient.UpbankClient("token", url=stub.url, scheduler=unthrottled(), cache=ResponseCache())
+            client.transactions(SINCE)
+            client.transactions(SINCE)
+            client.get("/categories")
+            self.assertEqual(3, len(stub.requests))
@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from beancount.ingest import cache
+
+from ledgertools import upbank_ingest, upfile
+from ledgertools.upfile import UpFile
+
+RAW_FILE = 'tests/test_data/up_transactions.json'
+
+
+class TestUpFile(unittest.TestCase):
+    """Stream the transactions of an Up download in either direction."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        with open(RAW_FILE) as fh:
+            self.transactions = json.load(fh)
+        # brackets, quotes and escapes in the strings shouldn't upset the scan
+        self.transactions[0]['attributes']['rawText'] = 'A "[quoted]" {brace} \\ ]}'
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _write(self, name, content):
+        filename = os.path.join(self.tempdir.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(filename, 'wt', encoding='utf-8') as fh:
+            fh.write(content)
+        return filename
+
+    def _files(self):
+        ndjson = ''.join(json.dumps(transaction) + '\n' for transaction in self.transactions)
+        return [
+            self._write('compact.json', json.dumps(self.transactions)),
+            self._write('pretty.json', json.dumps(self.transactions, indent=3)),
+            self._write('pretty.json.gz', json.dumps(self.transactions, indent=3)),
+            self._write('lines.ndjson', ndjson),
+            self._write('lines.ndjson.gz', ndjson + '\n'),
+        ]
+
+    def test_reversed(self):
+        for filename in self._files():
+            with UpFile(filename) as transactions:
+                self.assertEqual(list(reversed(self.transactions)), list(transactions), filename)
+
+    def test_forward(self):
+        for filename in self._files():
+            with UpFile(filename) as transactions:
+                self.assertEqual(self.transactions, list(transactions.forward()), filename)
+
+    def test_small_window(self):
+        self.transactions[1]['attributes']['description'] = 'Café ☕ Manly'
+        window = upfile.WINDOW
+        upfile.WINDOW = 100
+        try:
+            for filename in self._files():
+                with UpFile(filename) as transactions:
+                    self.assertEqual(list(reversed(self.transactions)), list(transactions), filename)
+        finally:
+            upfile.WINDOW = window
+
+    def test_empty(self):
+        for filename in [self._write('empty.json', ''), self._write('empty_array.json', '[]')]:
+            with UpFile(filename) as transactions:
+                self.assertEqual([], list(transactions))
+                self.assertEqual([], list(transactions.forward()))
+
+    def test_extract_ndjson(self):
+        importer = upbank_ingest.UpbankImporter()
+        expected = importer.extract(cache.get_file(os.path.abspath(RAW_FILE)))
+        with open(RAW_FILE) as fh:
+            ndjson = ''.join(json.dumps(transaction) + '\n' for transaction in json.load(fh))
+        filename = self._write('lines.ndjson.gz', ndjson)
+        entries = importer.extract(cache.get_file(filename))
+        self.assertEqual(
+            [(entry.date, entry.narration, entry.postings) for entry in expected],
+            [(entry.date, entry.narration, entry.postings) for entry in entries])
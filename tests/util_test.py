@@ -0,0 +1,10 @@
+import unittest
+
+from ledgertools import util
+
+
+class TestBatches(unittest.TestCase):
+
+    def test_batches(self):
+        self.assertEqual([[0, 1], [2, 3], [4]], list(util.batches(range(5), 2)))
+        self.assertEqual([], list(util.batches([], 2)))
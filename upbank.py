@@ -1,15 +1,21 @@
 import click
+import gzip
 import json
 import os
 import pprint
 import datetime
 from zoneinfo import ZoneInfo
-from ledgertools.upclient import UpbankClient, SETTLED
+from ledgertools.response_cache import FileResponseCache
+from ledgertools.store import TransactionStore, STORE_FILE
+from ledgertools.transaction import from_upbank
+from ledgertools.upclient import UpbankClient, SETTLED, MONTH, POOL_SIZE, WINDOWS, month_range
 
 if (UPBANK_TOKEN := os.getenv('UP_TOKEN')) is None:
     print('Please put a valid upbank token into an environment variable UP_TOKEN')
     exit(1)
 
+LOCAL_TZ = ZoneInfo("Australia/Melbourne")
+
 
 @click.group()
 def cli():
@@ -25,32 +31,103 @@ def ping():
     click.echo(response.text)
 
 
+def cache_option(command):
+    """Add the option to skip the cache of slow changing responses."""
+    return click.option("--no-cache", is_flag=True, help="Ask Upbank, not the cache.")(command)
+
+
+def cached_client(no_cache):
+    return UpbankClient(UPBANK_TOKEN, cache=None if no_cache else FileResponseCache())
+
+
 @cli.command()
-def categories():
+@cache_option
+def categories(no_cache):
     """Get a list of transaction categories."""
-    client = UpbankClient(UPBANK_TOKEN)
+    client = cached_client(no_cache)
     response = client.categories()
     click.echo(pprint.pformat(response))
 
 
 @cli.command()
-def balance():
+@cache_option
+def balance(no_cache):
     """Fetch the current balance of the account."""
-    client = UpbankClient(UPBANK_TOKEN)
+    client = cached_client(no_cache)
     response = client.accounts()
     print(response)
     click.echo("${0:.2f}".format(float(response[0]['attributes']['balance']['value'])))
 
 
+@cli.command()
+def uncache():
+    """Forget the cached categories and accounts."""
+    cached_client(False).invalidate()
+
+
+def parallel_options(command):
+    """Add the options for fetching date windows in parallel."""
+    command = click.option("--workers", default=1, help="Number of date windows to download at once.")(command)
+    command = click.option(
+        "--window", type=click.Choice(WINDOWS), default=MONTH, help="Size of the date windows."
+    )(command)
+    return command
+
+
+def output_options(command):
+    """Add the options for streaming out the transactions."""
+    command = click.option(
+        "--ndjson", is_flag=True, help="Write each transaction on its own line, as it arrives."
+    )(command)
+    command = click.option("--gzip", "compress", is_flag=True, help="Gzip the --ndjson output.")(command)
+    return command
+
+
+def store_option(command):
+    """Add the option to read from the local store, when it has the whole range."""
+    return click.option(
+        "--store", "store_file", default=STORE_FILE, help="Local store of transactions kept by `sync`."
+    )(command)
+
+
+def settled_transactions(since, until, workers, window, store_file):
+    """Return the settled transactions from the store if it has them all, else from Upbank."""
+    if store_file and os.path.exists(store_file):
+        with TransactionStore(store_file) as store:
+            if store.covers(since, until):
+                return store.transactions(since, until, SETTLED)
+    client = UpbankClient(UPBANK_TOKEN, pool_size=max(workers, POOL_SIZE))
+    return client.iter_transactions(since, until, SETTLED, workers, window)
+
+
+def write_ndjson(transactions, compress=False):
+    """Write the transactions to stdout, one json document per line."""
+    stdout = click.get_binary_stream("stdout")
+    if compress:
+        with gzip.GzipFile(fileobj=stdout, mode="wb") as stream:
+            for transaction in transactions:
+                stream.write(json.dumps(transaction).encode() + b"\n")
+    else:
+        for transaction in transactions:
+            stdout.write(json.dumps(transaction).encode() + b"\n")
+            stdout.flush()
+
+
 @cli.command()
 @click.argument("year", type=click.types.INT)
 @click.argument("month", type=click.types.INT)
-def month(year, month):
+@parallel_options
+@output_options
+@store_option
+def month(year, month, workers, window, ndjson, compress, store_file):
     """Download a sequence of transactions.
     """
-    client = UpbankClient(UPBANK_TOKEN)
-    transactions = client.get_month(year, month)
-    click.echo(json.dumps(transactions, indent=3))
+    since, until = month_range(year, month)
+    transactions = settled_transactions(since, until, workers, window, store_file)
+    if ndjson:
+        write_ndjson(transactions, compress)
+        return
+    click.echo(json.dumps(list(transactions), indent=3))
 
 
 @cli.command()
@@ -65,23 +142,14 @@ def brewfiona(rawfile, balance):
     tags = '#fiona'
     accountname = "Assets:Bank:Fiona-Upbank"
 
-    for trans in reversed(transactions):
-        date_str = trans['attributes']['createdAt'][:10]
-        raw_text = trans['attributes']['rawText']
-        description = trans['attributes']['description']
-        value = - float(trans['attributes']['amount']['value'])
-        try:
-            category = ':'.join([
-                trans['relationships']['parentCategory']['data']['id'],
-                trans['relationships']['category']['data']['id'],
-            ])
-        except TypeError:
-            category = ''
-        txt_description = f"\"{raw_text} [{description}]\""
+    for trans in map(from_upbank, reversed(transactions)):
+        date_str = trans.date.isoformat()
+        value = - float(trans.amount)
+        txt_description = f"\"{trans.raw_text} [{trans.merchant}]\""
         entry = f'{date_str} * {txt_description:66s}  {tags}\n'
         entry += f"    {accountname}\n"
         entry += "    %-46s %10.2f AUD\n" % (
-            f'ACCOUNT_UNKNOWN [{category}]', float(value))
+            f'ACCOUNT_UNKNOWN [{trans.category}]', float(value))
 
         click.echo(entry)
         change += float(value)
@@ -93,21 +161,41 @@ def brewfiona(rawfile, balance):
 @cli.command()
 @click.argument("fromdate", type=click.DateTime(formats=["%d/%m/%Y"]))
 @click.argument("todate", type=click.DateTime(formats=["%d/%m/%Y"]))
-def gettxns(fromdate, todate):
+@parallel_options
+@output_options
+@store_option
+def gettxns(fromdate, todate, workers, window, ndjson, compress, store_file):
     """Get all transactions for given date range
 
     Args:
         fromdate (datetime): from date in dd/mm/yyyy
         todate (datetime): to date in dd/mm/yyyy
     """
-    local_tz = ZoneInfo("Australia/Melbourne")
-    # local_tz = ZoneInfo("UTC")
-    fromdate = fromdate.replace(tzinfo=local_tz)
+    fromdate = fromdate.replace(tzinfo=LOCAL_TZ)
     # make end date to 11:59:59 to make sure to get all txns until end of the day
-    todate = todate.replace(tzinfo=local_tz) + datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
-    client = UpbankClient(UPBANK_TOKEN)
-    txns = client.transactions(fromdate, todate, SETTLED)
-    click.echo(json.dumps(txns))
+    todate = todate.replace(tzinfo=LOCAL_TZ) + datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+    txns = settled_transactions(fromdate, todate, workers, window, store_file)
+    if ndjson:
+        write_ndjson(txns, compress)
+        return
+    click.echo(json.dumps(list(txns)))
+
+
+@cli.command()
+@click.option("--since", type=click.DateTime(formats=["%d/%m/%Y"]), help="Date to sync from; needed the first time.")
+@click.option("--workers", default=1, help="Number of months to download at once.")
+@store_option
+def sync(since, workers, store_file):
+    """Copy the transactions since the last sync into the local store."""
+    if since is not None:
+        since = since.replace(tzinfo=LOCAL_TZ)
+    client = UpbankClient(UPBANK_TOKEN, pool_size=max(workers, POOL_SIZE))
+    with TransactionStore(store_file) as store:
+        try:
+            count = store.sync(client, since, workers=workers)
+        except ValueError as error:
+            raise click.UsageError(str(error))
+    click.echo(f"{count} transactions synced.")
 
 if __name__ == "__main__":
     cli()